@@ -0,0 +1,56 @@
+import random
+
+from django.core.cache import cache
+
+from shop_app.models import Product
+from shop_app.versioning import catalog_version
+
+# Пул и очередь действуют до изменения каталога (см. catalog_version)
+POOL_KEY = "banners:pool:{}"
+ROTATION_KEY = "banners:rotation:{}"
+POSITION_KEY = "banners:position"
+POOL_TIMEOUT = 300
+
+
+def get_pool() -> list:
+    """Кэшированный список id товаров, которые можно показывать в баннере."""
+    key = POOL_KEY.format(catalog_version())
+    pool = cache.get(key)
+    if pool is None:
+        pool = list(
+            Product.objects.filter(archived=False, available="true").values_list(
+                "pk", flat=True
+            )
+        )
+        cache.set(key, pool, POOL_TIMEOUT)
+    return pool
+
+
+def refresh_rotation(timeout=None) -> int:
+    """
+    Сохраняет в кэш перемешанный пул баннеров для поочередного показа.
+    Очередь сбрасывается при изменении каталога, до следующего обновления
+    баннеры выбираются из пула случайно.
+    Для работы с несколькими процессами нужен общий бэкенд кэша.
+    """
+    version = catalog_version()
+    cache.delete(POOL_KEY.format(version))
+    pool = get_pool()
+    random.shuffle(pool)
+    cache.set_many({ROTATION_KEY.format(version): pool, POSITION_KEY: 0}, timeout)
+    return len(pool)
+
+
+def choose_banners(k: int = 2) -> list:
+    rotation = cache.get(ROTATION_KEY.format(catalog_version()))
+    if rotation:
+        try:
+            position = cache.incr(POSITION_KEY) - 1
+        except ValueError:
+            position = 0
+            cache.set(POSITION_KEY, 1, None)
+        start = position * k
+        count = min(k, len(rotation))
+        return [rotation[(start + i) % len(rotation)] for i in range(count)]
+    pool = get_pool()
+    return random.sample(pool, min(k, len(pool)))
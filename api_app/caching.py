@@ -0,0 +1,108 @@
+import datetime
+import functools
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+from rest_framework.response import Response
+
+from shop_app.models import Product, ProductCategory, Tag
+from shop_app.versioning import catalog_cache_key
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+
+def cache_catalog_response(view_method):
+    """
+    Кэширует данные успешного ответа GET-метода представления.
+    Ключ строится из нормализованных параметров запроса, аргументов URL
+    и версии каталога, поэтому изменение любого товара, распродажи, отзыва,
+    тэга или категории сразу делает старые записи недоступными.
+    Представление может дополнить ключ методом get_cache_params().
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        params = {key: sorted(values) for key, values in request.query_params.lists()}
+        if hasattr(self, "get_cache_params"):
+            params["view"] = self.get_cache_params()
+        key = catalog_cache_key(
+            "response:" + type(self).__name__, [params, args, kwargs]
+        )
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    return wrapper
+
+
+def start_of_today() -> datetime.datetime:
+    return timezone.make_aware(
+        datetime.datetime.combine(timezone.localdate(), datetime.time.min)
+    )
+
+
+def product_last_modified(request, pk):
+    """
+    Время изменения товара для условных запросов.
+    Не раньше начала текущего дня, так как цена распродажи зависит от даты.
+    """
+    if not hasattr(request, "_product_last_modified"):
+        updated_at = (
+            Product.objects.filter(pk=pk).values_list("updated_at", flat=True).first()
+        )
+        if updated_at is not None:
+            updated_at = max(updated_at, start_of_today())
+        request._product_last_modified = updated_at
+    return request._product_last_modified
+
+
+def product_etag(request, pk):
+    last_modified = product_last_modified(request, pk)
+    if last_modified is None:
+        return None
+    return "product-{}-{}".format(pk, last_modified.timestamp())
+
+
+def list_state(request, model):
+    """Время последнего изменения и количество записей справочника."""
+    attr = "_{}_state".format(model._meta.model_name)
+    if not hasattr(request, attr):
+        setattr(
+            request,
+            attr,
+            model.objects.aggregate(last_modified=Max("updated_at"), total=Count("pk")),
+        )
+    return getattr(request, attr)
+
+
+def list_etag(model):
+    def etag(request, *args, **kwargs):
+        state = list_state(request, model)
+        if state["last_modified"] is None:
+            return None
+        return "{}-{}-{}".format(
+            model._meta.model_name,
+            state["total"],
+            state["last_modified"].timestamp(),
+        )
+
+    return etag
+
+
+def list_last_modified(model):
+    def last_modified(request, *args, **kwargs):
+        return list_state(request, model)["last_modified"]
+
+    return last_modified
+
+
+categories_etag = list_etag(ProductCategory)
+categories_last_modified = list_last_modified(ProductCategory)
+tags_etag = list_etag(Tag)
+tags_last_modified = list_last_modified(Tag)
@@ -0,0 +1,106 @@
+import functools
+import hashlib
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views import View
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Сколько ждать завершения первого запроса, прежде чем разрешить повтор
+# (на случай, если процесс упал, не записав ответ)
+IN_PROGRESS_TIMEOUT = 60
+
+
+def idempotency_key(request, key: str) -> str:
+    """Ключ записи: ключ клиента действует только для его пользователя и адреса."""
+    if request.user.is_authenticated:
+        owner = "user:{}".format(request.user.pk)
+    else:
+        if request.session.session_key is None:
+            # Без сессии повтор не отличить от запроса другого клиента
+            request.session.save()
+            request.session.modified = True
+        owner = "session:{}".format(request.session.session_key)
+    raw = "\n".join([owner, request.method, request.path, key])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def stored_response(record: IdempotencyKey):
+    if record.data is not None:
+        response = Response(record.data, status=record.status)
+    else:
+        response = HttpResponse(bytes(record.content), status=record.status)
+    for header, value in record.headers.items():
+        response[header] = value
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    """
+    Выполняет изменяющий запрос с заголовком Idempotency-Key один раз.
+    Ответ (кроме ошибок сервера) хранится в IdempotencyKey
+    IDEMPOTENCY_KEY_TIMEOUT секунд, повтор с тем же ключом получает
+    сохраненный ответ без повторного выполнения. Повтор, пришедший до
+    завершения первого запроса, получает 409, тот же ключ с другим телом
+    запроса - 422. Безопасные методы (GET, HEAD) выполняются всегда.
+    Подходит для функций-представлений и методов APIView.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        request = args[1] if isinstance(args[0], View) else args[0]
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or request.method in SAFE_METHODS:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return HttpResponse(status=400)
+
+        key = idempotency_key(request, key)
+        fingerprint = hashlib.md5(request.body).hexdigest()
+        now = timezone.now()
+        # Истекшая запись и запись упавшего запроса не мешают повтору
+        IdempotencyKey.objects.filter(key=key).filter(
+            Q(pk__in=IdempotencyKey.objects.expired(now).values("pk"))
+            | Q(
+                status__isnull=True,
+                created_at__lte=now - timedelta(seconds=IN_PROGRESS_TIMEOUT),
+            )
+        ).delete()
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    key=key, fingerprint=fingerprint, created_at=now
+                )
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(key=key).first()
+            if record is not None and record.fingerprint != fingerprint:
+                return HttpResponse(status=422)
+            if record is None or record.status is None:
+                return HttpResponse(status=409)
+            return stored_response(record)
+
+        try:
+            response = view(*args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+            return response
+        is_api = isinstance(response, Response)
+        record.status = response.status_code
+        record.data = response.data if is_api else None
+        record.content = None if is_api else response.content
+        record.headers = dict(response.items())
+        record.save(update_fields=["status", "data", "content", "headers"])
+        return response
+
+    return wrapper
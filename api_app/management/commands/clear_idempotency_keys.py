@@ -0,0 +1,39 @@
+import time
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from api_app.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Удаляет истекшие ответы на запросы с заголовком Idempotency-Key"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Повторять каждые N секунд (0 - выполнить один раз)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        interval = options["interval"]
+        while True:
+            now = timezone.now()
+            deleted = 0
+            while True:
+                pks = list(
+                    IdempotencyKey.objects.expired(now)
+                    .order_by("created_at")
+                    .values_list("pk", flat=True)[:batch_size]
+                )
+                if not pks:
+                    break
+                deleted += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
+            self.stdout.write(f"Deleted {deleted} idempotency keys")
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management import BaseCommand
+
+from api_app.banners import refresh_rotation
+
+
+class Command(BaseCommand):
+    help = "Обновляет перемешанный пул товаров для баннеров"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Обновлять пул каждые N секунд (0 - обновить один раз)",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        timeout = interval * 2 if interval else None
+        while True:
+            size = refresh_rotation(timeout)
+            self.stdout.write(f"Banner pool refreshed: {size} products")
+            if not interval:
+                break
+            time.sleep(interval)
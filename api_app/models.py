@@ -1,3 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def expired(self, now=None) -> "IdempotencyKeyQuerySet":
+        timeout = timedelta(seconds=settings.IDEMPOTENCY_KEY_TIMEOUT)
+        return self.filter(created_at__lte=(now or timezone.now()) - timeout)
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ответ на запрос с заголовком Idempotency-Key (см. api_app.idempotency).
+    Пока запрос выполняется, status пуст. Хранится в базе, чтобы повтор,
+    попавший в другой процесс, получил тот же ответ.
+    """
+
+    key = models.CharField(max_length=32, unique=True)
+    fingerprint = models.CharField(max_length=32)
+    status = models.PositiveSmallIntegerField(null=True)
+    data = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    content = models.BinaryField(null=True)
+    headers = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = IdempotencyKeyQuerySet.as_manager()
 
-# Create your models here.
+    def __str__(self):
+        return f"{self.key}: {self.status}"
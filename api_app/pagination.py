@@ -1,6 +1,20 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+import math
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
 from rest_framework.response import Response
 
+from shop_app.versioning import catalog_cache_key
 from .filters import CatalogFilter
 
 
@@ -16,3 +30,207 @@ class PaginationClass(PageNumberPagination):
                 "lastPage": self.page.paginator.num_pages,
             }
         )
+
+
+class CatalogCursorPagination(BasePagination):
+    """
+    Keyset-пагинация каталога.
+    Следующая страница выбирается условием по значениям полей сортировки
+    последнего товара (с pk в качестве разрешения равенства), поэтому
+    стоимость запроса не зависит от глубины страницы. Количество страниц
+    считается по кэшированному COUNT и обновляется раз в count_timeout секунд.
+    NULL считается больше любого значения: при сортировке по возрастанию
+    такие товары идут последними, по убыванию - первыми.
+    """
+
+    page_size = PaginationClass.page_size
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    count_timeout = 60
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor = self.decode_cursor(request)
+        self.page_number = self.cursor["p"] if self.cursor else 1
+        self.last_page = self.get_last_page(queryset)
+
+        self.ordering = self.get_ordering(queryset)
+        reverse = bool(self.cursor and self.cursor["r"])
+        order_by = [
+            (
+                F(name).desc(nulls_first=True)
+                if desc != reverse
+                else F(name).asc(nulls_last=True)
+            )
+            for name, desc in self.ordering
+        ]
+        queryset = queryset.order_by(*order_by)
+        if self.cursor:
+            queryset = queryset.filter(
+                self.get_keyset_filter(queryset, self.cursor["v"], reverse)
+            )
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        page = results[: self.page_size]
+        if reverse:
+            page.reverse()
+
+        self.next_cursor = None
+        self.previous_cursor = None
+        if page and (has_more or reverse):
+            self.next_cursor = self.encode_cursor(page[-1], self.page_number + 1)
+        if page and self.page_number > 1:
+            self.previous_cursor = self.encode_cursor(
+                page[0], self.page_number - 1, reverse=True
+            )
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "items": data,
+                "currentPage": self.page_number,
+                "lastPage": max(self.last_page, self.page_number),
+                "nextCursor": self.next_cursor,
+                "previousCursor": self.previous_cursor,
+            }
+        )
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        fields = []
+        for field in ordering:
+            if not isinstance(field, str) or field == "?":
+                raise ValueError(f"Unsupported ordering for keyset pagination: {field}")
+            name = field.lstrip("-")
+            fields.append((name, field.startswith("-")))
+        if not any(name in ("pk", "id") for name, _ in fields):
+            fields.append(("pk", False))
+        return fields
+
+    def get_keyset_filter(self, queryset, values, reverse):
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        values = [
+            self.to_python(queryset, name, value)
+            for (name, _), value in zip(self.ordering, values)
+        ]
+        keyset = Q()
+        for index, (name, desc) in enumerate(self.ordering):
+            condition = self.after(
+                name, values[index], desc != reverse, self.is_nullable(queryset, name)
+            )
+            if condition is None:
+                continue
+            for (prev_name, _), prev_value in zip(self.ordering[:index], values):
+                if prev_value is None:
+                    condition &= Q(**{f"{prev_name}__isnull": True})
+                else:
+                    condition &= Q(**{prev_name: prev_value})
+            keyset |= condition
+        if not keyset:
+            # Курсор указывает на последний товар
+            return Q(pk__in=[])
+        return keyset
+
+    def after(self, name, value, desc, nullable):
+        """
+        Условие "поле дальше value в порядке выдачи" с учетом NULL,
+        None - если таких значений нет.
+        """
+        if value is None:
+            return Q(**{f"{name}__isnull": False}) if desc else None
+        if desc:
+            return Q(**{f"{name}__lt": value})
+        condition = Q(**{f"{name}__gt": value})
+        if nullable:
+            condition |= Q(**{f"{name}__isnull": True})
+        return condition
+
+    def is_nullable(self, queryset, name):
+        if name == "pk":
+            return False
+        try:
+            return queryset.model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            # Аннотация может вернуть NULL
+            return True
+
+    def to_python(self, queryset, name, value):
+        try:
+            if name == "pk":
+                field = queryset.model._meta.pk
+            else:
+                field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = queryset.query.annotations[name].output_field
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_last_page(self, queryset):
+        key = catalog_cache_key("count", str(queryset.order_by().query))
+        count = cache.get_or_set(key, queryset.order_by().count, self.count_timeout)
+        return max(math.ceil(count / self.page_size), 1)
+
+    def encode_cursor(self, obj, page_number, reverse=False):
+        values = []
+        for name, _ in self.ordering:
+            value = getattr(obj, name)
+            if hasattr(value, "isoformat"):
+                value = value.isoformat()
+            elif value is not None and not isinstance(value, (int, float, str)):
+                value = str(value)
+            values.append(value)
+        data = json.dumps({"p": page_number, "v": values, "r": reverse})
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return {"p": int(data["p"]), "v": list(data["v"]), "r": bool(data["r"])}
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class ReviewsCursorPagination(CursorPagination):
+    """Постраничная выдача отзывов товара по возрастанию id."""
+
+    page_size = 10
+    ordering = "pk"
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "items": data,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+            }
+        )
+
+    def get_link_after(self, request, url: str, review) -> str:
+        """Ссылка на страницу отзывов, которая начинается после review."""
+        self.base_url = request.build_absolute_uri(url)
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=str(review.pk))
+        )
+
+
+class OrdersCursorPagination(CursorPagination):
+    """Постраничная выдача истории заказов, новые заказы первыми."""
+
+    page_size = 10
+    ordering = "-createdAt"
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "items": data,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+            }
+        )
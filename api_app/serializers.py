@@ -2,9 +2,10 @@ from django.contrib.auth.models import User
 from requests import request
 from rest_framework import serializers
 from rest_framework.relations import SlugRelatedField
-from django.db.models import Avg, Count, Sum
+from django.urls import reverse
 
 from cart_app.cart import Cart
+from shop_app.images import srcset
 from shop_app.models import (
     Product,
     ProductImage,
@@ -16,10 +17,19 @@ from shop_app.models import (
     Review,
     Order,
     Sale,
-    Specification,
-    OrderProductCount,
 )
 from profile_app.models import Avatar, Profile
+from .pagination import ReviewsCursorPagination
+
+
+def image_data(image) -> dict:
+    """Изображение с наборами производных размеров для srcset."""
+    return {
+        "src": image.src.url,
+        "alt": image.alt,
+        "srcset": srcset(image.src, image.src_widths),
+        "srcsetWebp": srcset(image.src, image.src_widths, "webp"),
+    }
 
 
 class TagsSerializer(serializers.ModelSerializer):
@@ -53,9 +63,16 @@ class ReviewsSerializer(serializers.ModelSerializer):
 
 
 class ProductSerializer(serializers.ModelSerializer):
+    """
+    Страница товара.
+    Ожидает выборку, построенную через Product.objects.for_detail().
+    """
+
     images = serializers.SerializerMethodField()
     tags = TagsSerializer(many=True)
     reviews = serializers.SerializerMethodField()
+    reviewsCount = serializers.IntegerField(source="reviews_count")
+    reviewsNext = serializers.SerializerMethodField()
     rating = serializers.SerializerMethodField()
     specifications = serializers.SerializerMethodField()
     price = serializers.SerializerMethodField()
@@ -75,38 +92,45 @@ class ProductSerializer(serializers.ModelSerializer):
             "images",
             "tags",
             "reviews",
+            "reviewsCount",
+            "reviewsNext",
             "specifications",
             "rating",
         ]
 
     def get_reviews(self, obj):
-        result = Review.objects.filter(product=obj.pk)
-        serializer = ReviewsSerializer(result, many=True)
+        serializer = ReviewsSerializer(obj.first_reviews, many=True)
         return serializer.data
 
+    def get_reviewsNext(self, obj):
+        request = self.context.get("request")
+        if request is None or len(obj.first_reviews) >= obj.reviews_count:
+            return None
+        url = reverse("api_app:review", kwargs={"pk": obj.pk})
+        return ReviewsCursorPagination().get_link_after(
+            request, url, obj.first_reviews[-1]
+        )
+
     def get_rating(self, obj):
-        result = Review.objects.filter(product=obj).aggregate(Avg("rate"))
-        return result["rate__avg"] or 0
+        return obj.rating or 0
 
     def get_specifications(self, obj):
-        result = Specification.objects.filter(product=obj.pk)
+        result = obj.specification.all()
         return [{"name": product.name, "value": product.value} for product in result]
 
     def get_images(self, obj):
-        images = [
-            {"src": product.src.url, "alt": product.alt} for product in obj.images.all()
-        ]
-        return images
+        return [image_data(image) for image in obj.images.all()]
 
     def get_price(self, obj):
-        if Sale.objects.filter(product=obj.pk):
-            result = Sale.objects.get(product=obj.pk)
-            return result.salePrice
-        else:
-            return obj.price
+        return obj.effective_price
 
 
 class SetProductsSerializer(serializers.ModelSerializer):
+    """
+    Карточка товара для списков.
+    Ожидает выборку, построенную через Product.objects.for_listing().
+    """
+
     images = serializers.SerializerMethodField()
     tags = serializers.SerializerMethodField()
     reviews = serializers.SerializerMethodField()
@@ -132,30 +156,20 @@ class SetProductsSerializer(serializers.ModelSerializer):
         ]
 
     def get_reviews(self, obj):
-        result = Review.objects.filter(product=obj).aggregate(Count("product"))
-        return result["product__count"]
+        return obj.reviews_count
 
     def get_rating(self, obj):
-        result = Review.objects.filter(product=obj).aggregate(Avg("rate"))
-        return result["rate__avg"] or 0
+        return obj.rating or 0
 
     def get_images(self, obj):
-        images = [
-            {"src": product.src.url, "alt": product.alt} for product in obj.images.all()
-        ]
-        return images
+        return [image_data(image) for image in obj.images.all()]
 
     def get_tags(self, obj):
-        products = Tag.objects.filter(product=obj.pk)
-        tags = [{"id": product.id, "name": product.name} for product in products]
+        tags = [{"id": tag.id, "name": tag.name} for tag in obj.tags.all()]
         return tags
 
     def get_price(self, obj):
-        if Sale.objects.filter(product=obj.pk):
-            result = Sale.objects.get(product=obj.pk)
-            return result.salePrice
-        else:
-            return obj.price
+        return obj.effective_price
 
 
 class SubcategorySerializer(serializers.ModelSerializer):
@@ -171,9 +185,7 @@ class SubcategorySerializer(serializers.ModelSerializer):
         )
 
     def get_image(self, obj):
-        image = obj.image
-        image = {"src": image.src.url, "alt": image.alt}
-        return image
+        return image_data(obj.image)
 
 
 class ProductCategorySerializer(serializers.ModelSerializer):
@@ -185,9 +197,7 @@ class ProductCategorySerializer(serializers.ModelSerializer):
         fields = "id", "title", "image", "subcategories"
 
     def get_image(self, obj):
-        image = obj.image
-        image = {"src": image.src.url, "alt": image.alt}
-        return image
+        return image_data(obj.image)
 
 
 class SalesSerializer(serializers.ModelSerializer):
@@ -210,8 +220,7 @@ class SalesSerializer(serializers.ModelSerializer):
         products = ProductImage.objects.select_related("product").filter(
             product_id=obj.product.id
         )
-        images = [{"src": product.src.url, "alt": product.alt} for product in products]
-        return images
+        return [image_data(image) for image in products]
 
     def get_id(self, obj):
         return obj.product.id
@@ -365,27 +374,22 @@ class OrdersSerializer(serializers.ModelSerializer):
         return obj.profile.fullName
 
     def get_totalCost(self, obj):
-        order = OrderProductCount.objects.filter(order_id=obj.id)
-        total_cost = 0
-        for item in order:
-            product = Product.objects.get(id=item.product_id)
-            total_cost += product.price * item.count_product
-        return total_cost
+        return obj.total_cost
 
     def get_products(self, obj):
-        order = OrderProductCount.objects.filter(order_id=obj.id)
+        """Строки заказа; ожидает выборку Order.objects.for_history()."""
         cart_products = []
-        total_cost = 0
-        for item in order:
-            product = Product.objects.get(id=item.product_id)
+        for item in obj.orders.all():
+            product = item.product
             cart_products.append(
                 {
                     "id": product.id,
-                    "category": product.category.id,
-                    "price": product.price,
+                    "category": product.category_id,
+                    "price": item.unit_price,
                     "count": item.count_product,
                     "date": product.date.strftime("%a %b %d %Y %H:%M:%S GMT%z (%Z)"),
-                    "title": product.title,
+                    "title": item.title,
+                    "saleApplied": item.sale_applied,
                     "description": product.description,
                     "freeDelivery": product.freeDelivery,
                     "images": [
@@ -395,12 +399,8 @@ class OrdersSerializer(serializers.ModelSerializer):
                     "tags": [
                         {"id": tag.id, "name": tag.name} for tag in product.tags.all()
                     ],
-                    "reviews": Review.objects.filter(product_id=product.pk).aggregate(
-                        count_review=Count("id")
-                    )["count_review"],
-                    "rating": Review.objects.filter(product_id=product.id).aggregate(
-                        average_rating=Avg("rate")
-                    )["average_rating"],
+                    "reviews": product.reviews_count,
+                    "rating": product.rating,
                 }
             )
 
@@ -1,3 +1,159 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from profile_app.models import Profile
+from shop_app.models import Order, Product, ProductCategory, StockHold, Tag
+
+
+class CheckoutTest(TestCase):
+    def setUp(self):
+        category = ProductCategory.objects.create(title="phones")
+        self.phone = Product.objects.create(
+            title="phone", price=100, count=3, category=category
+        )
+        self.laptop = Product.objects.create(
+            title="laptop", price=500, count=5, category=category
+        )
+        self.user = self.create_user("buyer")
+        self.client.force_login(self.user)
+
+    def create_user(self, username):
+        user = User.objects.create_user(username, password="secret")
+        Profile.objects.create(user=user, fullName=username, email="b@shop.io")
+        return user
+
+    def add_to_cart(self, product, count, client=None):
+        response = (client or self.client).post(
+            reverse("api_app:basket"),
+            {"id": product.pk, "count": count},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def checkout(self, **headers):
+        return self.client.post(reverse("api_app:orders"), **headers)
+
+    def test_checkout(self):
+        self.add_to_cart(self.phone, 2)
+        self.add_to_cart(self.laptop, 1)
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(pk=response.json()["orderId"])
+        self.assertEqual(order.total_cost, 700)
+        self.assertEqual(
+            sorted(order.orders.values_list("title", "count_product")),
+            [("laptop", 1), ("phone", 2)],
+        )
+        self.phone.refresh_from_db()
+        self.laptop.refresh_from_db()
+        self.assertEqual((self.phone.count, self.laptop.count), (1, 4))
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_insufficient_stock_lists_short_lines(self):
+        self.add_to_cart(self.phone, 2)
+        self.add_to_cart(self.laptop, 4)
+        Product.objects.filter(pk=self.laptop.pk).update(count=3)
+
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            response.json()["lines"],
+            [{"id": self.laptop.pk, "requested": 4, "available": 3}],
+        )
+        self.assertFalse(Order.objects.exists())
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.count, 3)
+
+    def test_other_cart_holds_reduce_stock(self):
+        self.add_to_cart(self.phone, 2)
+        other = self.client_class()
+        other.force_login(self.create_user("other"))
+        self.add_to_cart(self.phone, 1, client=other)
+        Product.objects.filter(pk=self.phone.pk).update(count=2)
+
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            response.json()["lines"],
+            [{"id": self.phone.pk, "requested": 2, "available": 1}],
+        )
+
+    def test_empty_cart(self):
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_idempotent_replay(self):
+        self.add_to_cart(self.phone, 1)
+        first = self.checkout(HTTP_IDEMPOTENCY_KEY="checkout-1")
+        self.add_to_cart(self.phone, 1)
+        replay = self.checkout(HTTP_IDEMPOTENCY_KEY="checkout-1")
+
+        self.assertEqual(replay.status_code, first.status_code)
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.count, 2)
+
+
+class CatalogCursorTest(TestCase):
+    def setUp(self):
+        category = ProductCategory.objects.create(title="phones")
+        for index in range(7):
+            Product.objects.create(
+                title="phone {}".format(index),
+                price=100 + index % 3,
+                count=1,
+                category=category,
+            )
+
+    def walk(self, params):
+        ids, cursor = [], ""
+        while True:
+            data = self.client.get(
+                reverse("api_app:catalog"), dict(params, cursor=cursor)
+            ).json()
+            ids += [item["id"] for item in data["items"]]
+            cursor = data["nextCursor"]
+            if not cursor:
+                return ids
+
+    def test_walk_returns_every_product_once(self):
+        expected = list(
+            Product.objects.order_by("-price", "pk").values_list("pk", flat=True)
+        )
+        self.assertEqual(self.walk({"sortType": "inc", "sort": "price"}), expected)
+
+    def test_walk_includes_products_without_date(self):
+        ids = self.walk({"sortType": "inc", "sort": "date"})
+        self.assertEqual(
+            sorted(ids), sorted(Product.objects.values_list("pk", flat=True))
+        )
+
+
+class CatalogFilterTest(TestCase):
+    def test_several_tags_do_not_repeat_products(self):
+        category = ProductCategory.objects.create(title="phones")
+        tags = [Tag.objects.create(name="new"), Tag.objects.create(name="5g")]
+        for index in range(4):
+            product = Product.objects.create(
+                title="phone {}".format(index), price=100, count=1, category=category
+            )
+            product.tags.set(tags)
+        params = {"tags[]": [tag.pk for tag in tags]}
+
+        pages = [
+            self.client.get(reverse("api_app:catalog"), dict(params, currentPage=page))
+            for page in (1, 2)
+        ]
+
+        ids = [item["id"] for page in pages for item in page.json()["items"]]
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(set(ids)), 4)
+        self.assertEqual(pages[0].json()["lastPage"], 2)
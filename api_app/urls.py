@@ -5,6 +5,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     BannersApiView,
     CatalogApiView,
+    CatalogFacetsApiView,
     ProductApiView,
     ProfileApiView,
     LimitedProductsApiView,
@@ -32,6 +33,7 @@ urlpatterns = [
     path("sign-out", LogoutView.as_view(), name="logout"),
     path("banners", BannersApiView.as_view(), name="banners"),
     path("catalog", CatalogApiView.as_view(), name="catalog"),
+    path("catalog/facets", CatalogFacetsApiView.as_view(), name="catalog-facets"),
     path("categories", ProductCategoryApiView.as_view(), name="categories"),
     path("products/limited", LimitedProductsApiView.as_view(), name="limited"),
     path("sales", SalesProductsApiView.as_view(), name="sales"),
@@ -1,5 +1,7 @@
+import calendar
 import datetime
-import random
+import os
+from functools import partial
 from urllib.parse import urlparse
 
 import requests
@@ -7,9 +9,18 @@ from django.contrib.auth import logout, authenticate, login
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib.auth.models import User
 from django.contrib.auth.views import LogoutView
-from django.core.files.uploadedfile import UploadedFile
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
 from django.db import transaction
-from django.http import HttpResponse, HttpRequest
+from django.http import HttpResponse, HttpRequest, JsonResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import (
+    condition,
+    require_POST,
+    require_http_methods,
+)
 from rest_framework import status
 from rest_framework.generics import (
     GenericAPIView,
@@ -20,7 +31,7 @@ from rest_framework.generics import (
     CreateAPIView,
     RetrieveAPIView,
 )
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from rest_framework.mixins import CreateModelMixin
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -32,12 +43,25 @@ from rest_framework.mixins import (
     UpdateModelMixin,
 )
 import json
-from django.db.models import Avg, Count
+from django.core.cache import cache
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    Max,
+    Min,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Least
 from rest_framework.views import APIView
 from rest_framework.filters import SearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
 
 from cart_app.cart import Cart
+from shop_app.versioning import bump_catalog_version, catalog_cache_key
 from shop_app.models import (
     Product,
     ProductCategory,
@@ -49,8 +73,12 @@ from shop_app.models import (
     Order,
     Sale,
     OrderProductCount,
+    StockHold,
 )
+from payment_app.gateways import GatewayError, get_gateway
+from payment_app.models import PaymentJob
 from profile_app.models import Profile, Avatar, profile_avatar_dir_path
+from profile_app.uploads import LimitedUploadHandler, check_image, schedule_avatar
 from .serializers import (
     ProductSerializer,
     ProfileSerializer,
@@ -63,25 +91,52 @@ from .serializers import (
     SalesSerializer,
     SetProductsSerializer,
 )
-from .pagination import PaginationClass
+from .banners import choose_banners
+from .idempotency import idempotent
+from .caching import (
+    cache_catalog_response,
+    RESPONSE_CACHE_TIMEOUT,
+    product_etag,
+    product_last_modified,
+    categories_etag,
+    categories_last_modified,
+    tags_etag,
+    tags_last_modified,
+)
+from .pagination import (
+    PaginationClass,
+    CatalogCursorPagination,
+    ReviewsCursorPagination,
+    OrdersCursorPagination,
+)
 import re
 from datetime import date
 
+PAYMENT_POLL_INTERVAL = 2
+
 
 class BannersApiView(APIView):
     """Представление для получения баннера сайта."""
 
     def get(self, request: Request) -> Response:
-        products = Product.objects.all()
+        product_ids = choose_banners(k=2)
+        # Пул кэшируется, товар мог с тех пор закончиться
+        products = (
+            Product.objects.for_listing()
+            .filter(archived=False, available="true")
+            .in_bulk(product_ids)
+        )
+        products = [products[pk] for pk in product_ids if pk in products]
         serialized = SetProductsSerializer(products, many=True)
-        return Response(random.choices(serialized.data, k=2))
+        return Response(serialized.data)
 
 
 class LimitedProductsApiView(APIView):
     """Представление для получения списка лимитированных товаров."""
 
+    @cache_catalog_response
     def get(self, request: Request) -> Response:
-        products = Product.objects.filter(count__lte=12)
+        products = Product.objects.for_listing().filter(count__lte=12)
         serialized = SetProductsSerializer(products, many=True)
         return Response(serialized.data)
 
@@ -89,88 +144,247 @@ class LimitedProductsApiView(APIView):
 class PopularProductsApiView(APIView):
     """Представление для получения списка популярных товаров."""
 
+    @cache_catalog_response
     def get(self, request: Request) -> Response:
-        products = Product.objects.annotate(count_review=Count("review")).filter(
-            count_review__gte=2
-        )
+        products = Product.objects.for_listing().filter(reviews_count__gte=2)
         serialized = SetProductsSerializer(products, many=True)
         return Response(serialized.data)
 
 
-class CatalogApiView(ListAPIView):
-    """Представление для получения каталога товаров."""
-
-    serializer_class = SetProductsSerializer
-    pagination_class = PaginationClass
+class CatalogFilterMixin:
+    """Фильтры каталога, общие для списка товаров и фасетов."""
 
     def parse_catalog(self, data):
         pattern = "/catalog/(.)/"
         num = re.findall(pattern, str(data))
         return num
 
+    def get_catalog_filters(self) -> dict:
+        """Нормализованный набор фильтров из параметров запроса."""
+        filters = {
+            "name": None,
+            "freeDelivery": False,
+            "available": False,
+            "category": None,
+            "tags": [],
+        }
+        params = self.request.query_params
+        if not params:
+            return filters
+
+        filters["name"] = params.get("filter[name]") or None
+        filters["freeDelivery"] = params.get("filter[freeDelivery]") == "true"
+        filters["available"] = params.get("filter[available]") == "true"
+
+        # category_id = self.request.query_params.get("category")
+        data = urlparse(self.request.META.get("HTTP_REFERER", ""))
+        category_id = self.parse_catalog(data)
+        if len(category_id) > 0:
+            filters["category"] = int(category_id[0])
+
+        filters["tags"] = sorted(set(map(int, params.getlist("tags[]"))))
+        return filters
+
+    def get_cache_params(self):
+        return self.get_catalog_filters()
+
+    def filter_catalog(self, queryset, filters: dict):
+        if filters["name"]:
+            queryset = queryset.search(filters["name"])
+        if filters["freeDelivery"]:
+            queryset = queryset.filter(freeDelivery=True)
+        if filters["available"]:
+            queryset = queryset.filter(available="true")
+        if filters["category"] is not None:
+            queryset = queryset.filter(category__id=filters["category"])
+        if filters["tags"]:
+            # Подзапрос, а не join: товар с несколькими тэгами из фильтра
+            # не должен повторяться в выдаче и в COUNT
+            tagged = Product.objects.filter(tags__in=filters["tags"]).values("pk")
+            queryset = queryset.filter(pk__in=tagged)
+        return queryset
+
+
+class CatalogApiView(CatalogFilterMixin, ListAPIView):
+    """Представление для получения каталога товаров."""
+
+    serializer_class = SetProductsSerializer
+    pagination_class = PaginationClass
+    cursor_pagination_class = CatalogCursorPagination
+
+    @property
+    def paginator(self):
+        """Keyset-пагинация включается параметром cursor в запросе."""
+        if not hasattr(self, "_paginator"):
+            cursor_param = self.cursor_pagination_class.cursor_query_param
+            if cursor_param in self.request.query_params:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    @cache_catalog_response
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
-        queryset = Product.objects.annotate(
-            reviews=Count("review"), rating=Avg("review__rate")
-        )
-        if self.request.query_params:
-            name = self.request.query_params.get("filter[name]")
-            if name:
-                queryset = queryset.filter(title__icontains=name)
-
-            freeDelivery = self.request.query_params.get("filter[freeDelivery]")
-            if freeDelivery == "true":
-                queryset = queryset.filter(freeDelivery=True)
-
-            available = self.request.query_params.get("filter[available]")
-            if available == "true":
-                queryset = queryset.filter(available="true")
-
-            # category_id = self.request.query_params.get("category")
-            data = urlparse(self.request.META.get("HTTP_REFERER", ""))
-            category_id = self.parse_catalog(data)
-
-            if len(category_id) > 0:
-                queryset = queryset.filter(category__id=category_id[0])
-
-            tags = self.request.query_params.get("tags[]")
-            if tags:
-                queryset = queryset.filter(tags__in=list(map(int, tags)))
-
-            sortType = self.request.query_params.get("sortType")
-            sort = self.request.query_params.get("sort")
-
-            if sort:
-                sort_params = {
-                    "decrating": "rating",
-                    "incrating": "-rating",
-                    "decprice": "price",
-                    "incprice": "-price",
-                    "decdate": "date",
-                    "incdate": "-date",
-                    "decreviews": "reviews",
-                    "increviews": "-reviews",
-                }[sortType + sort]
-            queryset = queryset.order_by(sort_params)
+        filters = self.get_catalog_filters()
+        queryset = self.filter_catalog(Product.objects.for_listing(), filters)
+        name = filters["name"]
+
+        sortType = self.request.query_params.get("sortType")
+        sort = self.request.query_params.get("sort")
+
+        if sort:
+            sort_params = {
+                "decrating": "rating",
+                "incrating": "-rating",
+                "decprice": "effective_price",
+                "incprice": "-effective_price",
+                "decdate": "date",
+                "incdate": "-date",
+                "decreviews": "reviews_count",
+                "increviews": "-reviews_count",
+                "decrelevance": "search_rank",
+                "increlevance": "search_rank",
+            }[sortType + sort]
+            if sort_params != "search_rank" or name:
+                queryset = queryset.order_by(sort_params, "pk")
+        elif name:
+            queryset = queryset.order_by("search_rank", "pk")
         return queryset
 
 
+class CatalogFacetsApiView(CatalogFilterMixin, APIView):
+    """Представление для получения количества товаров по фильтрам каталога."""
+
+    default_buckets = 10
+    max_buckets = 50
+
+    def get(self, request: Request) -> Response:
+        filters = self.get_catalog_filters()
+        try:
+            buckets = int(request.query_params.get("buckets", self.default_buckets))
+        except ValueError:
+            buckets = self.default_buckets
+        buckets = min(max(buckets, 1), self.max_buckets)
+
+        key = catalog_cache_key("facets", [filters, buckets])
+        facets = cache.get(key)
+        if facets is None:
+            facets = self.get_facets(filters, buckets)
+            cache.set(key, facets, RESPONSE_CACHE_TIMEOUT)
+        return Response(facets)
+
+    def get_facets(self, filters: dict, buckets: int) -> dict:
+        product_ids = self.filter_catalog(Product.objects.all(), filters).values("pk")
+        products = Product.objects.with_price().filter(pk__in=product_ids)
+
+        totals = products.aggregate(
+            total=Count("pk"),
+            freeDelivery=Count("pk", filter=Q(freeDelivery=True)),
+            available=Count("pk", filter=Q(available="true")),
+            min_price=Min("effective_price"),
+            max_price=Max("effective_price"),
+        )
+        tags = (
+            Tag.objects.filter(product__in=product_ids)
+            .annotate(count=Count("product"))
+            .order_by("name")
+        )
+        categories = (
+            ProductCategory.objects.filter(product__in=product_ids)
+            .annotate(count=Count("product"))
+            .order_by("title")
+        )
+        return {
+            "total": totals["total"],
+            "tags": [
+                {"id": tag.id, "name": tag.name, "count": tag.count} for tag in tags
+            ],
+            "categories": [
+                {"id": category.id, "title": category.title, "count": category.count}
+                for category in categories
+            ],
+            "freeDelivery": totals["freeDelivery"],
+            "available": totals["available"],
+            "price": self.get_price_histogram(
+                products, totals["min_price"], totals["max_price"], buckets
+            ),
+        }
+
+    def get_price_histogram(self, products, min_price, max_price, buckets) -> dict:
+        histogram = {"min": min_price, "max": max_price, "histogram": []}
+        if min_price is None:
+            return histogram
+        width = (max_price - min_price) / buckets or 1
+        counts = dict(
+            products.annotate(
+                bucket=Least(
+                    Cast((F("effective_price") - min_price) / width, IntegerField()),
+                    buckets - 1,
+                )
+            )
+            .order_by()
+            .values_list("bucket")
+            .annotate(count=Count("pk"))
+        )
+        histogram["histogram"] = [
+            {
+                "from": min_price + width * index,
+                "to": (
+                    max_price
+                    if index == buckets - 1
+                    else min_price + width * (index + 1)
+                ),
+                "count": counts.get(index, 0),
+            }
+            for index in range(buckets)
+        ]
+        return histogram
+
+
 class SalesProductsApiView(ListAPIView):
-    queryset = Sale.objects.select_related("product")
     serializer_class = SalesSerializer
     pagination_class = PaginationClass
 
+    def get_queryset(self):
+        # Только действующие распродажи, как в ценах товаров
+        return Sale.objects.active().select_related("product").order_by("pk")
+
+    @cache_catalog_response
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 class ProductApiView(RetrieveAPIView):
     """Представление для получения товара."""
 
-    queryset = Product.objects.all()
     serializer_class = ProductSerializer
     lookup_field = "pk"
 
+    def get_queryset(self):
+        # Выборка строится на каждый запрос: цена зависит от текущей даты
+        return Product.objects.for_detail(
+            reviews_limit=ReviewsCursorPagination.page_size
+        )
+
+    @method_decorator(
+        condition(etag_func=product_etag, last_modified_func=product_last_modified)
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 class ProductCategoryApiView(APIView):
     """Представление для получения категорий и подкатегорий товаров."""
 
+    @method_decorator(
+        condition(
+            etag_func=categories_etag, last_modified_func=categories_last_modified
+        )
+    )
+    @cache_catalog_response
     def get(self, request: Request) -> Response:
         queryset = ProductCategory.objects.all()
         serializer = ProductCategorySerializer(queryset, many=True)
@@ -178,18 +392,26 @@ class ProductCategoryApiView(APIView):
 
 
 class ProductReviewApiView(APIView):
-    """Представление для создания отзыва."""
+    """Представление для получения отзывов товара и создания отзыва."""
+
+    def get(self, request: Request, pk) -> Response:
+        queryset = Review.objects.filter(product_id=pk).select_related("author")
+        paginator = ReviewsCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = ReviewsSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request: Request, pk="pk") -> Response:
         product = Product.objects.get(pk=pk)
         data = request.data
         instance = request.user.profile
-        new_review = Review.objects.create(
-            product=product,
-            author=instance,
-            text=data["text"],
-            rate=data["rate"],
-        )
+        with transaction.atomic():
+            new_review = Review.objects.create(
+                product=product,
+                author=instance,
+                text=data["text"],
+                rate=data["rate"],
+            )
         return Response(ReviewsSerializer(new_review).data)
 
 
@@ -244,13 +466,46 @@ class UpdatePasswordApiView(APIView):
             return Response(serializer.data)
 
 
+@csrf_exempt
 def avatar(request):
-    if request.method == "POST":
-        profile = request.user.profile
-        file = request.FILES["avatar"]
-        profile.avatar.src = file
-        profile.avatar.save()
-    return HttpResponse(status=200)
+    """
+    Загрузка аватара. Файл пишется на диск частями с ограничением
+    AVATAR_MAX_UPLOAD_SIZE, размеры проверяются по заголовку изображения,
+    а уменьшение и перекодирование выполняются в фоне.
+    Обработчики загрузки подменяются до проверки CSRF, которая читает тело
+    запроса, поэтому она выполняется в upload_avatar.
+    """
+    # Анонимный и заведомо большой запросы отклоняются без чтения тела
+    # (с запасом на заголовки multipart)
+    if not request.user.is_authenticated:
+        return HttpResponse(status=403)
+    content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    if content_length > settings.AVATAR_MAX_UPLOAD_SIZE + 64 * 1024:
+        return JsonResponse({"error": "file is too large"}, status=413)
+    handler = LimitedUploadHandler(request, settings.AVATAR_MAX_UPLOAD_SIZE)
+    request.upload_handlers = [handler]
+    return upload_avatar(request, handler)
+
+
+@csrf_protect
+@require_POST
+def upload_avatar(request, handler: LimitedUploadHandler):
+    if handler.exceeded:
+        return JsonResponse({"error": "file is too large"}, status=413)
+    file = request.FILES.get("avatar")
+    if not isinstance(file, TemporaryUploadedFile):
+        return JsonResponse({"error": "no file"}, status=400)
+    error = check_image(file.temporary_file_path())
+    if error:
+        return JsonResponse({"error": error}, status=400)
+
+    # Временный файл переименовывается, чтобы его не удалил Django
+    # по окончании запроса, удалит его обработчик
+    path = file.temporary_file_path() + ".avatar"
+    os.replace(file.temporary_file_path(), path)
+    avatar, _ = Avatar.objects.get_or_create(profile=request.user.profile)
+    transaction.on_commit(partial(schedule_avatar, avatar.pk, path))
+    return HttpResponse(status=202)
 
 
 def signIn(request):
@@ -261,6 +516,7 @@ def signIn(request):
         user = authenticate(request, username=username, password=password)
         if user is not None:
             login(request, user)
+            Cart(request).merge_anonymous()
             return HttpResponse(status=200)
         else:
             return HttpResponse(status=500)
@@ -289,48 +545,125 @@ def signOut(request):
 class TagApiView(APIView):
     """Представление для получения тэгов."""
 
+    @method_decorator(
+        condition(etag_func=tags_etag, last_modified_func=tags_last_modified)
+    )
+    @cache_catalog_response
     def get(self, request: Request) -> Response:
         queryset = Tag.objects.all()
         serializer = TagsSerializer(queryset, many=True)
         return Response(serializer.data)
 
 
+def short_lines(products, quantities: dict) -> list:
+    """Строки заказа, которые нельзя выполнить из свободного остатка."""
+    stock = products.filter(pk__in=quantities).in_bulk()
+    return [
+        {
+            "id": pk,
+            "requested": count,
+            "available": stock[pk].stock_available if pk in stock else 0,
+        }
+        for pk, count in quantities.items()
+        if pk not in stock or stock[pk].stock_available < count
+    ]
+
+
 class OrdersApiView(APIView):
     """Представление для получения списка заказов."""
 
     permission_classes = (IsAuthenticated,)
 
     def get(self, request):
-        queryset = Order.objects.select_related("profile").prefetch_related("products")
-        serializer = OrdersSerializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = Order.objects.filter(profile=request.user.profile).for_history()
+        paginator = OrdersCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = OrdersSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
+    @method_decorator(idempotent)
     def post(self, request):
         cart = Cart(request)
         profile = request.user.profile
-        order = Order.objects.create(profile=profile)
-        for item, value in cart.cart.items():
-            product = Product.objects.get(id=item)
-
-            OrderProductCount.objects.create(
-                product=product, order=order, count_product=value["quantity"]
+        owner = cart.storage.get_hold_owner()
+        lines = cart.get_lines()
+        quantities = {line.product.pk: line.quantity for line in lines}
+        if not quantities:
+            return Response(
+                {"error": "cart is empty"}, status=status.HTTP_400_BAD_REQUEST
             )
-            order.products.add(product)
-            product.count -= value["quantity"]
-            if product.count == 0:
-                product.available = product.AVAILABLE_CHOICES[1][1]
-            product.save()
-        order.status = Order.STATUS_CHOICES[1][1]
 
-        order.save()
+        # Резервы покупателя превращаются в продажу, чужие действующие
+        # резервы уменьшают доступный остаток
+        products = Product.objects.with_stock(exclude_owner=owner)
+        with transaction.atomic():
+            # Строки товаров блокируются, нехватка определяется до списания
+            short = short_lines(products.select_for_update(), quantities)
+            updated = 0
+            if not short:
+                requested = Case(
+                    *[
+                        When(pk=pk, then=Value(count))
+                        for pk, count in quantities.items()
+                    ],
+                    output_field=IntegerField(),
+                )
+                updated = products.filter(
+                    pk__in=quantities, stock_available__gte=requested
+                ).update(count=F("count") - requested, updated_at=timezone.now())
+                if updated == len(quantities):
+                    order = self.create_order(profile, owner, lines, quantities)
+                else:
+                    # Чужой резерв появился после проверки; остаток
+                    # перечитывается после отката
+                    transaction.set_rollback(True)
+        if updated != len(quantities):
+            return Response(
+                {
+                    "error": "insufficient stock",
+                    "lines": short or short_lines(products, quantities),
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        bump_catalog_version()
         return Response({"orderId": order.id})
 
+    def create_order(self, profile, owner, lines, quantities):
+        """Оформляет заказ после списания остатков."""
+        Product.objects.filter(pk__in=quantities, count=0).update(available="false")
+        if owner is not None:
+            StockHold.objects.release(owner, quantities)
+        # Цены и названия сохраняются в заказе и дальше не зависят
+        # от каталога
+        order = Order.objects.create(
+            profile=profile,
+            status=Order.STATUS_CHOICES[1][1],
+            total_cost=sum(line.total_price for line in lines),
+        )
+        OrderProductCount.objects.bulk_create(
+            [
+                OrderProductCount(
+                    product=line.product,
+                    order=order,
+                    count_product=line.quantity,
+                    title=line.product.title,
+                    unit_price=line.price,
+                    sale_applied=line.price < line.product.price,
+                )
+                for line in lines
+            ]
+        )
+        Order.products.through.objects.bulk_create(
+            [Order.products.through(order=order, product_id=pk) for pk in quantities]
+        )
+        return order
+
 
 class OrderDetailApiView(APIView):
     """Представление для получения заказа."""
 
     def get(self, request, pk):
-        queryset = Order.objects.get(pk=pk)
+        queryset = Order.objects.for_history().get(pk=pk)
         serializer = OrdersSerializer(queryset)
         return Response(serializer.data)
 
@@ -349,14 +682,14 @@ class CartDetailView(APIView):
 
     def get_cart_items(self, cart):
         cart_items = []
-        for item in cart:
-            product = Product.objects.get(id=item["product_id"])
+        for line in cart.get_lines():
+            product = line.product
             cart_items.append(
                 {
                     "id": product.id,
-                    "category": product.category.id,
-                    "price": float(item["price"]),
-                    "count": item["quantity"],
+                    "category": product.category_id,
+                    "price": float(line.price),
+                    "count": line.quantity,
                     "date": product.date.strftime("%a %b %d %Y %H:%M:%S GMT%z (%Z)"),
                     "title": product.title,
                     "description": product.description,
@@ -368,12 +701,8 @@ class CartDetailView(APIView):
                     "tags": [
                         {"id": tag.id, "name": tag.name} for tag in product.tags.all()
                     ],
-                    "reviews": Review.objects.filter(product_id=product.pk).aggregate(
-                        count_review=Count("id")
-                    )["count_review"],
-                    "rating": Review.objects.filter(product_id=product.id).aggregate(
-                        average_rating=Avg("rate")
-                    )["average_rating"],
+                    "reviews": product.reviews_count,
+                    "rating": product.rating,
                 }
             )
 
@@ -413,28 +742,61 @@ class CartDetailView(APIView):
         return Response(cart_items)
 
 
-@transaction.atomic
+def payment_response(job, status=200):
+    """Статус оплаты заказа; пока платеж не завершен, клиент опрашивает его."""
+    response = JsonResponse(
+        {
+            "orderId": job.order_id,
+            "paymentId": job.pk,
+            "status": job.status,
+            "error": job.error,
+        },
+        status=status,
+    )
+    if not job.finished:
+        response["Retry-After"] = PAYMENT_POLL_INTERVAL
+    return response
+
+
+@require_http_methods(["GET", "POST"])
+@idempotent
 def payment(request, id):
+    """
+    POST ставит оплату заказа в очередь и сразу отвечает 202,
+    платеж проводит команда process_payments. GET возвращает статус
+    последнего платежа заказа. Доступно только владельцу заказа.
+    """
+    if not request.user.is_authenticated:
+        return HttpResponse(status=403)
+    order = get_object_or_404(Order, id=id, profile=request.user.profile)
+    if request.method == "GET":
+        job = order.payments.order_by("-pk").first()
+        if job is None:
+            return HttpResponse(status=404)
+        return payment_response(job)
+
     body = json.loads(request.body)
-    cart = Cart(request)
-    order = Order.objects.get(id=id)
-    order.status = Order.STATUS_CHOICES[2][1]
-    date_now = date.today()
-    if int(body["month"]) in [1, 3, 5, 7, 8, 10, 12]:
-        last_day = 31
-    elif int(body["month"]) in [2, 4, 6, 9, 11]:
-        last_day = 30
-    else:
-        last_day = 29
-
-    cart_date = datetime.date(int("20" + body["year"]), int(body["month"]), last_day)
-    if cart_date < date_now:
+    month, year = int(body["month"]), int("20" + body["year"])
+    last_day = calendar.monthrange(year, month)[1]
+    cart_date = datetime.date(year, month, last_day)
+    if cart_date < date.today():
         print("cart is not available")
         return HttpResponse(status=400)
     if len(body["code"]) != 3:
         return HttpResponse(status=400)
 
-    else:
-        order.save()
-        cart.clear()
-        return HttpResponse(status=200)
+    card = {
+        "number": body.get("number", ""),
+        "name": body.get("name", ""),
+        "month": body["month"],
+        "year": body["year"],
+        "code": body["code"],
+    }
+    # Карта передается платежной системе и в базе не сохраняется
+    try:
+        card_token = get_gateway().tokenize(card)
+    except GatewayError:
+        return JsonResponse({"error": "payment service unavailable"}, status=503)
+    job = PaymentJob.objects.submit(order, card_token)
+    Cart(request).clear()
+    return payment_response(job, status=202)
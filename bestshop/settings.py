@@ -9,7 +9,9 @@ https://docs.djangoproject.com/en/4.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
+
 import os
+import sys
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -46,6 +48,8 @@ INSTALLED_APPS = [
     "shop_app.apps.ShopAppConfig",
     "profile_app.apps.ProfileAppConfig",
     "api_app.apps.ApiAppConfig",
+    "cart_app.apps.CartAppConfig",
+    "payment_app.apps.PaymentAppConfig",
 ]
 
 MIDDLEWARE = [
@@ -92,6 +96,29 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Версия каталога и кэш ответов хранятся здесь. Кэш должен быть общим
+# для всех процессов: версию каталога меняют и веб-процессы, и команды
+# (rebuild_ratings, rebuild_search_index), и пул обработки изображений.
+# В продакшене лучше Redis или Memcached.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+    }
+}
+
+# Тесты используют кэш в памяти процесса
+if sys.argv[1:2] == ["test"]:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -149,6 +176,55 @@ INTERNAL_IPS = [
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "uploads"
 
+# Медиафайлы хранятся по хешу содержимого без дубликатов
+STORAGES = {
+    "default": {"BACKEND": "shop_app.storage.ContentAddressedStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
 CART_SESSION_ID = "cart"
 
+# Хранилище корзин: DatabaseCartStorage, SessionCartStorage или
+# MemoryCartStorage (для тестов)
+CART_STORAGE = "cart_app.storage.DatabaseCartStorage"
+
+# Время жизни неизменявшейся корзины (для команды clear_expired_carts)
+CART_TTL = 60 * 60 * 24 * 30
+
+# Время резерва товара после добавления в корзину; свободный остаток
+# товара - count минус действующие резервы других корзин
+CART_HOLD_TIMEOUT = 60 * 15
+
+# Платежи проводит команда process_payments через PAYMENT_GATEWAY.
+# Сбои платежной системы повторяются до PAYMENT_MAX_ATTEMPTS раз с
+# удваивающейся задержкой от PAYMENT_RETRY_DELAY секунд; задание,
+# обработчик которого упал, забирается снова через PAYMENT_LEASE_TIMEOUT
+PAYMENT_GATEWAY = "payment_app.gateways.FakeGateway"
+PAYMENT_MAX_ATTEMPTS = 5
+PAYMENT_RETRY_DELAY = 30
+PAYMENT_LEASE_TIMEOUT = 60 * 5
+
+# Сколько хранятся ответы на запросы с заголовком Idempotency-Key
+# (заказы и оплата, таблица IdempotencyKey; старые записи удаляет
+# команда clear_idempotency_keys)
+IDEMPOTENCY_KEY_TIMEOUT = 60 * 60 * 24
+
+# Процессы для создания производных размеров загруженных изображений
+# (0 - создавать в процессе запроса, например в тестах)
+IMAGE_DERIVATIVE_WORKERS = 2
+
+# Передача медиафайлов веб-серверу: None - отдает Django,
+# "x-accel-redirect" - nginx (internal location MEDIA_ACCEL_PREFIX,
+# указывающий на MEDIA_ROOT), "x-sendfile" - Apache/lighttpd
+MEDIA_SERVE_OFFLOAD = None
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+
+# Аватары: максимальный размер файла, размеры исходного изображения
+# и сторона уменьшенного (обработка в пуле IMAGE_DERIVATIVE_WORKERS)
+AVATAR_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+AVATAR_MAX_DIMENSIONS = (6000, 6000)
+AVATAR_SIZE = 512
+
 # LOGIN_REDIRECT_URL = reverse_lazy('frontend/profile.html')
@@ -17,16 +17,15 @@ Including another URLconf
 
 from django.contrib import admin
 from django.conf import settings
-from django.conf.urls.static import static
 from django.urls import path, include
 import debug_toolbar
 
+from shop_app.views import serve_media
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("frontend.urls")),
     path("api/", include("api_app.urls")),
     path("__debug__/", include("debug_toolbar.urls")),
+    path(settings.MEDIA_URL.lstrip("/") + "<path:path>", serve_media, name="media"),
 ]
-
-if settings.DEBUG:
-    urlpatterns.extend(static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT))
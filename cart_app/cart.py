@@ -1,44 +1,69 @@
 from django.conf import settings
+from django.core.cache import cache
 
-from shop_app.models import Product, Sale
+from shop_app.models import Product, StockHold
+from shop_app.versioning import catalog_cache_key
+from .storage import get_cart_storage
+
+EMPTY_SUMMARY = {"count": 0, "total": 0}
+SUMMARY_TIMEOUT = 60 * 60 * 24
+
+
+class CartLine(object):
+    """Строка корзины: товар с ценой на сегодня и количеством."""
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+        self.price = product.effective_price
+
+    @property
+    def total_price(self):
+        return self.price * self.quantity
 
 
 class Cart(object):
-    """Объект корзины в сессии"""
+    """Объект корзины; данные хранятся в бэкенде settings.CART_STORAGE"""
 
     def __init__(self, request):
         """Инициализация корзины."""
-        self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        self.storage = get_cart_storage(request)
+        self.load()
+
+    def load(self):
+        """Загрузка товаров корзины из хранилища."""
+        self.cart = {
+            str(product_id): {"quantity": quantity}
+            for product_id, quantity in self.storage.items().items()
+        }
+        self._lines = None
+
+    def get_lines(self):
+        """
+        Строки корзины с товарами, ценами распродаж, изображениями и тэгами.
+        Вся корзина загружается тремя запросами независимо от числа строк,
+        результат запоминается до следующего изменения корзины.
+        """
+        if self._lines is None:
+            products = Product.objects.for_listing().in_bulk(
+                [int(product_id) for product_id in self.cart]
+            )
+            self._lines = [
+                CartLine(products[int(product_id)], item["quantity"])
+                for product_id, item in sorted(self.cart.items())
+                if int(product_id) in products
+            ]
+        return self._lines
 
     def __iter__(self):
         """Перебор элементов в корзине и получение продуктов из базы данных."""
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        cart = self.cart.copy()
-
-        for product in products:
-            product_id = str(product.id)
-            sales = Sale.objects.filter(product=product.id)
-            if sales:
-                sale = sales.get(product=product.id)
-                last_price = sale.salePrice
-            else:
-                last_price = product.price
-
-            cart[product_id]["product_id"] = product_id
-            cart[product_id]["price"] = float(last_price)
-            cart[product_id]["total_price"] = (
-                cart[product_id]["price"] * cart[product_id]["quantity"]
-            )
-
-        sorted_cart = sorted(cart.values(), key=lambda item: item["product_id"])
-
-        for item in sorted_cart:
-            yield item
+        for line in self.get_lines():
+            yield {
+                "product_id": str(line.product.id),
+                "quantity": line.quantity,
+                "price": float(line.price),
+                "total_price": float(line.total_price),
+            }
 
     def __len__(self):
         return sum(item["quantity"] for item in self.cart.values())
@@ -47,17 +72,17 @@ class Cart(object):
         """Добавление товара в корзину или обновление количества товара."""
         product_id = str(product.id)
 
-        if product_id not in self.cart:
-            self.cart[product_id] = {"quantity": 0, "price": float(product.price)}
-
-        available_quantity = product.count
-        if quantity <= available_quantity:
-            if override_quantity:
-                self.cart[product_id]["quantity"] = quantity
-            else:
-                self.cart[product_id]["quantity"] += quantity
+        if not override_quantity and product_id in self.cart:
+            quantity += self.cart[product_id]["quantity"]
+        if StockHold.objects.reserve(
+            self.storage.get_hold_owner(create=True),
+            product.id,
+            quantity,
+            settings.CART_HOLD_TIMEOUT,
+        ):
+            self.cart[product_id] = {"quantity": quantity}
+            self.storage.set(product.id, quantity)
             self.save()
-            available_quantity -= quantity
         else:
             print("недостаточное количество товара")
             return self.cart
@@ -66,24 +91,65 @@ class Cart(object):
         """Удаление товара из корзины."""
         product_id = str(product.id)
         if product_id in self.cart:
+            owner = self.storage.get_hold_owner()
+            holds = StockHold.objects.filter(owner=owner, product_id=product.id)
             if quantity >= self.cart[product_id]["quantity"]:
                 del self.cart[product_id]
+                self.storage.remove(product.id)
+                holds.delete()
             else:
                 self.cart[product_id]["quantity"] -= quantity
+                self.storage.set(product.id, self.cart[product_id]["quantity"])
+                holds.update(quantity=self.cart[product_id]["quantity"])
             self.save()
 
     def get_total_price(self):
         """Подсчет стоимости товаров в корзине."""
-        return sum(
-            float(item["price"]) * item["quantity"] for item in self.cart.values()
-        )
+        return sum(float(line.total_price) for line in self.get_lines())
+
+    def get_summary(self):
+        """Подсчет количества и суммы с сохранением в кэш."""
+        summary = {"count": len(self), "total": self.get_total_price()}
+        key = self.storage.get_summary_key()
+        if key is not None:
+            cache.set(catalog_cache_key(key, None), summary, SUMMARY_TIMEOUT)
+        return summary
 
     def clear(self):
-        """Удаление корзины из сессии."""
-        del self.session[settings.CART_SESSION_ID]
-        self.session.modified = True
+        """Удаление корзины и резервов ее товаров."""
+        owner = self.storage.get_hold_owner()
+        if owner is not None:
+            StockHold.objects.release(owner)
+        self.storage.clear()
+        self.cart = {}
+        self.save()
+
+    def merge_anonymous(self):
+        """Добавление анонимной корзины к корзине вошедшего пользователя."""
+        source = self.storage.merge_anonymous()
+        if source is not None:
+            StockHold.objects.transfer(source, self.storage.get_hold_owner())
+        self.load()
+        self.save()
 
     def save(self):
-        """Сохранение корзины."""
-        self.session[settings.CART_SESSION_ID] = self.cart
-        self.session.modified = True
+        """Сброс рассчитанных строк и сводки после изменения корзины."""
+        self._lines = None
+        key = self.storage.get_summary_key()
+        if key is not None:
+            cache.delete(catalog_cache_key(key, None))
+
+
+def get_cart_summary(request):
+    """
+    Количество товаров и сумма корзины для шапки сайта.
+    Берется из кэша без запросов к товарам; кэш сбрасывается при изменении
+    корзины, а также вместе с версией каталога (цены могли измениться).
+    """
+    key = get_cart_storage(request).get_summary_key()
+    if key is None:
+        return EMPTY_SUMMARY
+    summary = cache.get(catalog_cache_key(key, None))
+    if summary is None:
+        summary = Cart(request).get_summary()
+    return summary
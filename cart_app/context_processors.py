@@ -1,5 +1,14 @@
-from cart_app.cart import Cart
+from django.utils.functional import SimpleLazyObject
+
+from cart_app.cart import Cart, get_cart_summary
 
 
 def cart(request):
-    return {"cart": Cart(request)}
+    """
+    Корзина загружается только при обращении к ней из шаблона.
+    Для значка в шапке достаточно cart_summary.count и cart_summary.total.
+    """
+    return {
+        "cart": SimpleLazyObject(lambda: Cart(request)),
+        "cart_summary": SimpleLazyObject(lambda: get_cart_summary(request)),
+    }
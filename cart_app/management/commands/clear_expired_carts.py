@@ -0,0 +1,16 @@
+import datetime
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = "Удаляет корзины, которые не изменялись дольше CART_TTL секунд"
+
+    def handle(self, *args, **options):
+        storage_class = import_string(settings.CART_STORAGE)
+        before = timezone.now() - datetime.timedelta(seconds=settings.CART_TTL)
+        deleted = storage_class.clear_expired(before)
+        self.stdout.write(f"Deleted {deleted} expired carts")
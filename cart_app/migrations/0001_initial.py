@@ -0,0 +1,83 @@
+# Generated by Django 4.2 on 2026-10-17 01:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("shop_app", "0017_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Basket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.CharField(max_length=100, unique=True, verbose_name="owner"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, db_index=True, verbose_name="updated_at"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "basket",
+                "verbose_name_plural": "baskets",
+            },
+        ),
+        migrations.CreateModel(
+            name="BasketLine",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.PositiveIntegerField(default=1, verbose_name="quantity"),
+                ),
+                (
+                    "basket",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lines",
+                        to="cart_app.basket",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="shop_app.product",
+                        verbose_name="product",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="basketline",
+            constraint=models.UniqueConstraint(
+                fields=("basket", "product"), name="unique_basket_product"
+            ),
+        ),
+    ]
@@ -1,3 +1,37 @@
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+from shop_app.models import Product
+
+
+class Basket(models.Model):
+    """Корзина, хранящаяся в базе данных"""
+
+    class Meta:
+        verbose_name_plural = _("baskets")
+        verbose_name = _("basket")
+
+    owner = models.CharField(max_length=100, unique=True, verbose_name=_("owner"))
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name=_("updated_at")
+    )
+
+    def __str__(self):
+        return self.owner
+
+
+class BasketLine(models.Model):
+    """Товар в корзине"""
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["basket", "product"], name="unique_basket_product"
+            ),
+        ]
+
+    basket = models.ForeignKey(Basket, on_delete=models.CASCADE, related_name="lines")
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, verbose_name=_("product")
+    )
+    quantity = models.PositiveIntegerField(default=1, verbose_name=_("quantity"))
@@ -0,0 +1,274 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Basket, BasketLine
+
+
+def get_cart_storage(request):
+    storage_class = import_string(settings.CART_STORAGE)
+    return storage_class(request)
+
+
+class BaseCartStorage(object):
+    """
+    Хранилище корзины.
+    Владелец корзины - пользователь или анонимный токен, который
+    записывается в сессию только при первом изменении корзины.
+    """
+
+    token_session_key = "cart_token"
+
+    def __init__(self, request):
+        self.session = request.session
+        self.user = getattr(request, "user", None)
+
+    def get_owner(self, create=False):
+        if self.user is not None and self.user.is_authenticated:
+            return "user:{}".format(self.user.pk)
+        token = self.session.get(self.token_session_key)
+        if token is None:
+            if not create:
+                return None
+            token = self.session[self.token_session_key] = uuid.uuid4().hex
+        return "anonymous:{}".format(token)
+
+    def get_hold_owner(self, create=False):
+        """Владелец резервов товара корзины (см. StockHold)."""
+        return self.get_owner(create)
+
+    def get_summary_key(self):
+        """Ключ кэша для количества и суммы корзины (None - не кэшировать)."""
+        owner = self.get_owner()
+        return owner and "cart:summary:{}".format(owner)
+
+    def items(self):
+        """Словарь id товара -> количество."""
+        owner = self.get_owner()
+        if owner is None:
+            return {}
+        return self.load(owner)
+
+    def set(self, product_id, quantity):
+        self.set_quantity(self.get_owner(create=True), product_id, quantity)
+
+    def remove(self, product_id):
+        owner = self.get_owner()
+        if owner is not None:
+            self.delete(owner, product_id)
+
+    def clear(self):
+        owner = self.get_owner()
+        if owner is not None:
+            self.delete_all(owner)
+
+    def merge_anonymous(self):
+        """
+        Переносит анонимную корзину из сессии в корзину пользователя.
+        Возвращает прежнего владельца анонимной корзины или None.
+        """
+        token = self.session.pop(self.token_session_key, None)
+        owner = self.get_owner()
+        if token is None or owner is None:
+            return None
+        source = "anonymous:{}".format(token)
+        self.merge(source, owner)
+        return source
+
+    def load(self, owner):
+        raise NotImplementedError
+
+    def set_quantity(self, owner, product_id, quantity):
+        raise NotImplementedError
+
+    def delete(self, owner, product_id):
+        raise NotImplementedError
+
+    def delete_all(self, owner):
+        raise NotImplementedError
+
+    def merge(self, source, target):
+        raise NotImplementedError
+
+    @classmethod
+    def clear_expired(cls, before):
+        """Удаляет корзины, не изменявшиеся с момента before."""
+        raise NotImplementedError
+
+
+class SessionCartStorage(BaseCartStorage):
+    """Корзина целиком в сессии (каждое изменение перезаписывает сессию)."""
+
+    def get_owner(self, create=False):
+        return settings.CART_SESSION_ID
+
+    def get_hold_owner(self, create=False):
+        # Корзина лежит в сессии, резервы привязываются к пользователю
+        # или анонимному токену, как в остальных хранилищах
+        return BaseCartStorage.get_owner(self, create)
+
+    def get_summary_key(self):
+        key = self.session.session_key
+        return key and "cart:summary:session:{}".format(key)
+
+    def load(self, owner):
+        cart = self.session.get(settings.CART_SESSION_ID) or {}
+        return {int(pk): item["quantity"] for pk, item in cart.items()}
+
+    def save(self, items):
+        self.session[settings.CART_SESSION_ID] = {
+            str(pk): {"quantity": quantity} for pk, quantity in items.items()
+        }
+        self.session.modified = True
+
+    def set_quantity(self, owner, product_id, quantity):
+        items = self.load(owner)
+        items[product_id] = quantity
+        self.save(items)
+
+    def delete(self, owner, product_id):
+        items = self.load(owner)
+        items.pop(product_id, None)
+        self.save(items)
+
+    def delete_all(self, owner):
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self.session.modified = True
+
+    def merge_anonymous(self):
+        # Данные сессии сохраняются при входе пользователя,
+        # переносятся только резервы анонимного токена
+        token = self.session.pop(self.token_session_key, None)
+        return token and "anonymous:{}".format(token)
+
+    @classmethod
+    def clear_expired(cls, before):
+        # Корзины удаляются вместе с истекшими сессиями
+        return 0
+
+
+class MemoryCartStorage(BaseCartStorage):
+    """Корзины в памяти процесса; используется в тестах."""
+
+    carts = {}
+    lock = threading.Lock()
+
+    def load(self, owner):
+        with self.lock:
+            cart = self.carts.get(owner)
+            return dict(cart["items"]) if cart else {}
+
+    def touch(self, owner):
+        cart = self.carts.setdefault(owner, {"items": {}})
+        cart["updated_at"] = time.time()
+        return cart["items"]
+
+    def set_quantity(self, owner, product_id, quantity):
+        with self.lock:
+            self.touch(owner)[product_id] = quantity
+
+    def delete(self, owner, product_id):
+        with self.lock:
+            self.touch(owner).pop(product_id, None)
+
+    def delete_all(self, owner):
+        with self.lock:
+            self.carts.pop(owner, None)
+
+    def merge(self, source, target):
+        with self.lock:
+            cart = self.carts.pop(source, None)
+            if cart is None:
+                return
+            items = self.touch(target)
+            for product_id, quantity in cart["items"].items():
+                items[product_id] = items.get(product_id, 0) + quantity
+
+    @classmethod
+    def clear_expired(cls, before):
+        timestamp = before.timestamp()
+        with cls.lock:
+            expired = [
+                owner
+                for owner, cart in cls.carts.items()
+                if cart["updated_at"] < timestamp
+            ]
+            for owner in expired:
+                del cls.carts[owner]
+        return len(expired)
+
+
+class DatabaseCartStorage(BaseCartStorage):
+    """Корзины в таблицах Basket и BasketLine с построчными изменениями."""
+
+    def load(self, owner):
+        return dict(
+            BasketLine.objects.filter(basket__owner=owner).values_list(
+                "product_id", "quantity"
+            )
+        )
+
+    def get_basket(self, owner):
+        basket, created = Basket.objects.get_or_create(owner=owner)
+        if not created:
+            Basket.objects.filter(pk=basket.pk).update(updated_at=timezone.now())
+        return basket
+
+    def set_quantity(self, owner, product_id, quantity):
+        with transaction.atomic():
+            basket = self.get_basket(owner)
+            updated = BasketLine.objects.filter(
+                basket=basket, product_id=product_id
+            ).update(quantity=quantity)
+            if not updated:
+                BasketLine.objects.create(
+                    basket=basket, product_id=product_id, quantity=quantity
+                )
+
+    def delete(self, owner, product_id):
+        BasketLine.objects.filter(basket__owner=owner, product_id=product_id).delete()
+
+    def delete_all(self, owner):
+        Basket.objects.filter(owner=owner).delete()
+
+    def merge(self, source, target):
+        with transaction.atomic():
+            items = self.load(source)
+            if not items:
+                Basket.objects.filter(owner=source).delete()
+                return
+            current = self.load(target)
+            basket = self.get_basket(target)
+            BasketLine.objects.bulk_create(
+                [
+                    BasketLine(
+                        basket=basket,
+                        product_id=product_id,
+                        quantity=current.get(product_id, 0) + quantity,
+                    )
+                    for product_id, quantity in items.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["basket", "product"],
+                update_fields=["quantity"],
+            )
+            Basket.objects.filter(owner=source).delete()
+
+    @classmethod
+    def clear_expired(cls, before, batch_size=1000):
+        deleted = 0
+        while True:
+            pks = list(
+                Basket.objects.filter(updated_at__lt=before).values_list(
+                    "pk", flat=True
+                )[:batch_size]
+            )
+            if not pks:
+                return deleted
+            Basket.objects.filter(pk__in=pks).delete()
+            deleted += len(pks)
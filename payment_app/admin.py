@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import PaymentJob
+
+
+@admin.register(PaymentJob)
+class PaymentJobAdmin(admin.ModelAdmin):
+    list_display = ("pk", "order", "status", "attempts", "run_at", "updated_at")
+    list_filter = ("status",)
+    list_select_related = ("order__profile",)
+    exclude = ("card_token",)
+    readonly_fields = ("attempts", "error", "created_at", "updated_at")
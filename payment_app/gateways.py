@@ -0,0 +1,65 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def get_gateway():
+    gateway_class = import_string(settings.PAYMENT_GATEWAY)
+    return gateway_class()
+
+
+class GatewayError(Exception):
+    """Временная ошибка платежной системы, платеж будет повторен."""
+
+
+class ChargeResult(object):
+    """Ответ платежной системы: платеж принят или отклонен с причиной."""
+
+    def __init__(self, approved, error=""):
+        self.approved = approved
+        self.error = error
+
+
+class BaseGateway(object):
+    """
+    Платежная система.
+    Данные карты передаются ей один раз при запросе на оплату, взамен
+    приходит токен, по которому проводится платеж; магазин карту не хранит.
+    reference одинаков для всех попыток одного платежа, по нему
+    платежная система не списывает деньги повторно.
+    """
+
+    def tokenize(self, card: dict) -> str:
+        raise NotImplementedError
+
+    def charge(self, reference, amount, token) -> ChargeResult:
+        raise NotImplementedError
+
+
+class FakeGateway(BaseGateway):
+    """
+    Локальная платежная система для разработки.
+    Отклоняет карты с нечисловым номером или номером, оканчивающимся на 0,
+    и отвечает с задержкой PAYMENT_FAKE_DELAY секунд.
+    """
+
+    def tokenize(self, card: dict) -> str:
+        # Итог оплаты определяется сразу, в токене нет данных карты
+        number = str(card.get("number", ""))
+        if not number.isdigit():
+            outcome = "invalid"
+        elif number.endswith("0"):
+            outcome = "declined"
+        else:
+            outcome = "ok"
+        return "fake-{}-{}".format(outcome, uuid.uuid4().hex)
+
+    def charge(self, reference, amount, token) -> ChargeResult:
+        time.sleep(getattr(settings, "PAYMENT_FAKE_DELAY", 0))
+        if token.startswith("fake-declined-"):
+            return ChargeResult(False, "payment declined")
+        if not token.startswith("fake-ok-"):
+            return ChargeResult(False, "invalid card number")
+        return ChargeResult(True)
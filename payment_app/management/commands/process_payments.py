@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from payment_app.gateways import get_gateway
+from payment_app.models import PaymentJob
+from payment_app.processing import process_job
+
+
+class Command(BaseCommand):
+    help = "Проводит платежи из очереди заданий PaymentJob"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Проверять очередь каждые N секунд (0 - обработать один раз)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        interval = options["interval"]
+        gateway = get_gateway()
+        while True:
+            jobs = PaymentJob.objects.claim(batch_size, settings.PAYMENT_LEASE_TIMEOUT)
+            for job in jobs:
+                status = process_job(job, gateway)
+                self.stdout.write(
+                    f"Payment {job.pk} for order {job.order_id}: {status}"
+                )
+            if not interval:
+                break
+            if not jobs:
+                time.sleep(interval)
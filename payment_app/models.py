@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from shop_app.models import Order
+
+
+class PaymentJobQuerySet(models.QuerySet):
+    def active(self) -> "PaymentJobQuerySet":
+        """Задания, которые еще выполняются или уже оплатили заказ."""
+        return self.exclude(status=PaymentJob.FAILED)
+
+    def submit(self, order: Order, card_token: str) -> "PaymentJob":
+        """
+        Ставит оплату заказа в очередь. Пока у заказа есть незавершенное
+        или успешное задание, возвращается оно, новое не создается.
+        """
+        try:
+            with transaction.atomic():
+                return self.create(order=order, card_token=card_token)
+        except IntegrityError:
+            return self.active().get(order=order)
+
+    def due(self, now=None) -> "PaymentJobQuerySet":
+        """
+        Задания, готовые к обработке: ожидающие своей попытки и
+        обрабатываемые, у которых истекла аренда (обработчик упал).
+        """
+        return self.filter(
+            status__in=[PaymentJob.PENDING, PaymentJob.PROCESSING],
+            run_at__lte=now or timezone.now(),
+        )
+
+    def claim(self, batch_size: int, lease: int) -> "PaymentJobQuerySet":
+        """
+        Забирает до batch_size заданий в обработку на lease секунд.
+        Задание переводится условным UPDATE по прежним статусу и run_at,
+        поэтому несколько обработчиков не получат одно задание дважды.
+        """
+        now = timezone.now()
+        candidates = (
+            self.due(now)
+            .order_by("run_at")
+            .values_list("pk", "status", "run_at")[:batch_size]
+        )
+        claimed = [
+            pk
+            for pk, status, run_at in candidates
+            if self.filter(pk=pk, status=status, run_at=run_at).update(
+                status=PaymentJob.PROCESSING,
+                run_at=now + timedelta(seconds=lease),
+                attempts=F("attempts") + 1,
+                updated_at=now,
+            )
+        ]
+        return self.filter(pk__in=claimed).select_related("order")
+
+
+class PaymentJob(models.Model):
+    """
+    Задание на оплату заказа.
+    Создается запросом на оплату и выполняется командой process_payments;
+    клиент узнает результат, опрашивая статус.
+    """
+
+    PENDING = "pending"
+    PROCESSING = "processing"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (PENDING, _("Pending")),
+        (PROCESSING, _("Processing")),
+        (SUCCEEDED, _("Succeeded")),
+        (FAILED, _("Failed")),
+    ]
+
+    class Meta:
+        verbose_name_plural = _("payments")
+        verbose_name = _("payment")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["order"],
+                condition=~Q(status="failed"),
+                name="unique_active_payment",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "run_at"], name="payment_job_due_idx"),
+        ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="payments")
+    status = models.CharField(
+        choices=STATUS_CHOICES,
+        max_length=20,
+        default=PENDING,
+        verbose_name=_("status"),
+    )
+    # Токен карты в платежной системе, очищается по завершении платежа
+    card_token = models.CharField(max_length=250, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.CharField(max_length=250, blank=True)
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PaymentJobQuerySet.as_manager()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def __str__(self):
+        return f"Payment{self.pk}, order {self.order_id}: {self.status}"
@@ -0,0 +1,64 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from shop_app.models import Order
+from .models import PaymentJob
+
+log = logging.getLogger(__name__)
+
+
+def process_job(job: PaymentJob, gateway) -> str:
+    """
+    Проводит платеж по заданию, забранному через PaymentJob.objects.claim().
+    Результат записывается, только пока аренда задания принадлежит этому
+    обработчику. Возвращает новый статус задания.
+    """
+    owned = PaymentJob.objects.filter(
+        pk=job.pk, status=PaymentJob.PROCESSING, run_at=job.run_at
+    )
+    now = timezone.now()
+    try:
+        result = gateway.charge(
+            "payment-{}".format(job.pk), job.order.total_cost, job.card_token
+        )
+    except Exception as error:
+        # Сбой связи или платежной системы; отказ в оплате приходит
+        # в ChargeResult и не повторяется
+        log.warning("Payment %s attempt %s failed: %s", job.pk, job.attempts, error)
+        if job.attempts >= settings.PAYMENT_MAX_ATTEMPTS:
+            owned.update(
+                status=PaymentJob.FAILED,
+                card_token="",
+                error=str(error),
+                updated_at=now,
+            )
+            return PaymentJob.FAILED
+        delay = settings.PAYMENT_RETRY_DELAY * 2 ** (job.attempts - 1)
+        owned.update(
+            status=PaymentJob.PENDING,
+            run_at=now + timedelta(seconds=delay),
+            error=str(error),
+            updated_at=now,
+        )
+        return PaymentJob.PENDING
+
+    if not result.approved:
+        owned.update(
+            status=PaymentJob.FAILED,
+            card_token="",
+            error=result.error,
+            updated_at=now,
+        )
+        return PaymentJob.FAILED
+    with transaction.atomic():
+        if owned.update(
+            status=PaymentJob.SUCCEEDED, card_token="", error="", updated_at=now
+        ):
+            Order.objects.filter(pk=job.order_id).update(
+                status=Order.STATUS_CHOICES[2][1]
+            )
+    return PaymentJob.SUCCEEDED
@@ -0,0 +1,71 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from profile_app.models import Profile
+from shop_app.models import Order
+from .models import PaymentJob
+
+
+class PaymentTest(TestCase):
+    def setUp(self):
+        self.user = self.create_user("buyer")
+        self.order = Order.objects.create(
+            profile=self.user.profile, city="c", total_cost=100
+        )
+        self.client.force_login(self.user)
+        self.url = reverse("api_app:payment", args=[self.order.pk])
+
+    def create_user(self, username):
+        user = User.objects.create_user(username, password="secret")
+        Profile.objects.create(user=user, fullName=username, email="b@shop.io")
+        return user
+
+    def pay(self, number="4242", code="123"):
+        card = {"number": number, "name": "B", "month": "02", "year": "99"}
+        return self.client.post(
+            self.url, json.dumps(dict(card, code=code)), content_type="application/json"
+        )
+
+    def process(self):
+        call_command("process_payments", stdout=StringIO())
+
+    def test_payment(self):
+        response = self.pay()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], PaymentJob.PENDING)
+        job = PaymentJob.objects.get()
+        self.assertNotIn("4242", job.card_token)
+
+        self.process()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()["status"], PaymentJob.SUCCEEDED)
+        job.refresh_from_db()
+        self.assertEqual(job.card_token, "")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.STATUS_CHOICES[2][1])
+
+    def test_declined(self):
+        self.pay(number="4240")
+        self.process()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()["status"], PaymentJob.FAILED)
+        self.assertEqual(response.json()["error"], "payment declined")
+
+    def test_invalid_code(self):
+        self.assertEqual(self.pay(code="12").status_code, 400)
+        self.assertFalse(PaymentJob.objects.exists())
+
+    def test_status_only_for_owner(self):
+        self.pay()
+        other = self.client_class()
+        other.force_login(self.create_user("other"))
+
+        self.assertEqual(other.get(self.url).status_code, 404)
+        self.assertEqual(self.client_class().get(self.url).status_code, 403)
@@ -2,12 +2,11 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 
+from shop_app.storage import sharded_upload_path
+
 
 def profile_avatar_dir_path(instance: "Avatar", filename: str) -> str:
-    return "users/user_{pk}/avatar/{filename}".format(
-        pk=instance.pk,
-        filename=filename,
-    )
+    return sharded_upload_path("users/avatars", filename)
 
 
 class Profile(models.Model):
@@ -1,3 +1,77 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .models import Avatar, Profile
+
+
+def image_file(width, height, name="avatar.jpg"):
+    content = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 10, 10)).save(content, "JPEG")
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+class AvatarUploadTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(
+            MEDIA_ROOT=self.media_root,
+            IMAGE_DERIVATIVE_WORKERS=0,
+            STORAGES={
+                "default": {
+                    "BACKEND": "django.core.files.storage.FileSystemStorage",
+                },
+                "staticfiles": {
+                    "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+                },
+            },
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user("user", password="secret")
+        self.profile = Profile.objects.create(
+            user=self.user, fullName="U", email="u@shop.io"
+        )
+        self.client.force_login(self.user)
+        self.url = reverse("api_app:avatar")
+
+    def upload(self, file, client=None):
+        return (client or self.client).post(self.url, {"avatar": file})
+
+    def test_upload_is_resized(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload(image_file(2000, 1000))
+
+        self.assertEqual(response.status_code, 202)
+        avatar = Avatar.objects.get(profile=self.profile)
+        with avatar.src.open() as source:
+            self.assertEqual(Image.open(source).size, (512, 256))
+
+    def test_anonymous(self):
+        response = self.upload(image_file(10, 10), client=self.client_class())
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(AVATAR_MAX_UPLOAD_SIZE=1024)
+    def test_too_large(self):
+        data = io.BytesIO()
+        noise = Image.effect_noise((200, 200), 100).convert("RGB")
+        noise.save(data, "PNG")
+        response = self.upload(SimpleUploadedFile("a.png", data.getvalue()))
+        self.assertEqual(response.status_code, 413)
+
+    @override_settings(AVATAR_MAX_DIMENSIONS=(100, 100))
+    def test_dimensions_checked(self):
+        response = self.upload(image_file(200, 50))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "image is too large"})
+
+    def test_not_an_image(self):
+        response = self.upload(SimpleUploadedFile("a.jpg", b"not an image"))
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,94 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from shop_app.images import build_derivatives, get_executor, log_failure
+from shop_app.signals import release_image
+from .models import Avatar
+
+AVATAR_FORMATS = ("JPEG", "PNG", "WEBP", "GIF")
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет загружаемые файлы частями во временный файл на диске
+    и обрывает загрузку, если получено больше max_size байт.
+    """
+
+    def __init__(self, request=None, max_size: int = 0):
+        super().__init__(request)
+        self.max_size = max_size
+        self.received = 0
+        self.exceeded = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.exceeded = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def check_image(path: str):
+    """
+    Проверяет формат и размеры изображения по заголовку файла
+    (пиксели не декодируются). Возвращает текст ошибки или None.
+    """
+    try:
+        with Image.open(path) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        return "invalid image"
+    if image_format not in AVATAR_FORMATS:
+        return "unsupported image format"
+    max_width, max_height = settings.AVATAR_MAX_DIMENSIONS
+    if width > max_width or height > max_height:
+        return "image is too large"
+    return None
+
+
+def process_avatar(avatar_id: int, path: str) -> None:
+    """
+    Уменьшает загруженный аватар до AVATAR_SIZE, сохраняет его в JPEG
+    и создает производные. Временный файл path удаляется.
+    """
+    try:
+        with Image.open(path) as source:
+            image = ImageOps.exif_transpose(source).convert("RGB")
+        image.thumbnail((settings.AVATAR_SIZE, settings.AVATAR_SIZE), Image.LANCZOS)
+        content = io.BytesIO()
+        image.save(content, "JPEG", quality=85)
+    finally:
+        os.remove(path)
+
+    field = Avatar._meta.get_field("src")
+    name = default_storage.save(
+        field.generate_filename(None, "avatar.jpg"), ContentFile(content.getvalue())
+    )
+    with transaction.atomic():
+        avatar = Avatar.objects.select_for_update().filter(pk=avatar_id).first()
+        if avatar is None:
+            release_image(default_storage, name)
+            return
+        release_image(default_storage, avatar.src.name)
+        Avatar.objects.filter(pk=avatar_id).update(src=name)
+    build_derivatives(name)
+
+
+def schedule_avatar(avatar_id: int, path: str) -> None:
+    """
+    Передает обработку аватара в пул процессов IMAGE_DERIVATIVE_WORKERS
+    (0 - обработать сразу).
+    """
+    if not settings.IMAGE_DERIVATIVE_WORKERS:
+        process_avatar(avatar_id, path)
+        return
+    get_executor().submit(process_avatar, avatar_id, path).add_done_callback(
+        log_failure
+    )
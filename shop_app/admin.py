@@ -1,9 +1,10 @@
 from django.contrib import admin
-from django.db.models import QuerySet, Min
+from django.db.models import OuterRef, QuerySet, Subquery
 from django.http import HttpRequest
+from django.utils import timezone
 from django.utils.safestring import mark_safe
-from django.db.models import Avg, Count, Sum
 from django.utils.translation import gettext_lazy as _
+from .versioning import bump_catalog_version
 from .models import (
     Product,
     Order,
@@ -49,14 +50,16 @@ class SpecificationInline(admin.StackedInline):
 def mark_available(
     modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet
 ):
-    queryset.update(available="true")
+    queryset.update(available="true", updated_at=timezone.now())
+    bump_catalog_version()
 
 
 @admin.action(description=_("not available"))
 def mark_not_available(
     modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet
 ):
-    queryset.update(available="false")
+    queryset.update(available="false", updated_at=timezone.now())
+    bump_catalog_version()
 
 
 @admin.register(Product)
@@ -90,6 +93,7 @@ class ProductAdmin(admin.ModelAdmin):
         "freeDelivery",
     )
     list_display_links = "pk", "title"
+    list_select_related = ("category",)
     ordering = ("pk",)
     search_fields = "title", "description", "price"
     fieldsets = [
@@ -124,17 +128,26 @@ class ProductAdmin(admin.ModelAdmin):
         ),
     ]
 
+    def get_queryset(self, request):
+        sale_price = (
+            Sale.objects.active()
+            .filter(product=OuterRef("pk"))
+            .order_by("salePrice")
+            .values("salePrice")[:1]
+        )
+        return super().get_queryset(request).annotate(sale_price=Subquery(sale_price))
+
+    @admin.display(description=_("rating"), ordering="rating")
     def rating(self, obj):
-        result = Review.objects.filter(product=obj).aggregate(Avg("rate"))
-        return result["rate__avg"]
+        return obj.rating
 
+    @admin.display(description=_("reviews"), ordering="reviews_count")
     def reviews(self, obj):
-        result = Review.objects.filter(product=obj).aggregate(Count("product"))
-        return result["product__count"]
+        return obj.reviews_count
 
+    @admin.display(description=_("sale"), ordering="sale_price")
     def sale(self, obj):
-        result = Sale.objects.filter(product=obj).aggregate(Min("salePrice"))
-        return result["salePrice__min"]
+        return obj.sale_price
 
     def preview_show(self, obj):
         if obj.preview:
@@ -164,6 +177,7 @@ class OrderAdmin(admin.ModelAdmin):
         "paymentType",
         "total_price",
     )
+    list_select_related = ("profile__user",)
 
     fieldsets = [
         (
@@ -180,14 +194,9 @@ class OrderAdmin(admin.ModelAdmin):
         )
     ]
 
-    def get_queryset(self, request):
-        return Order.objects.select_related("profile").prefetch_related("products")
-
+    @admin.display(description=_("total_cost"), ordering="total_cost")
     def total_price(self, obj):
-        result = Order.objects.filter(id=obj.id).aggregate(
-            prod_sum=Sum("products__price")
-        )
-        return result["prod_sum"]
+        return obj.total_cost
 
     @admin.display(description=_("user_verbose"))
     def user_verbose(self, obj: Order) -> str:
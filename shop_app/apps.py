@@ -6,3 +6,6 @@ class ShopAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "shop_app"
     verbose_name = _("shop")
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,168 @@
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .versioning import bump_catalog_version
+
+log = logging.getLogger(__name__)
+
+# Размеры производных изображений по большей стороне
+DERIVATIVE_SIZES = {
+    "thumbnail": 160,
+    "card": 480,
+    "detail": 1200,
+}
+# WebP для современных браузеров и JPEG как запасной вариант
+DERIVATIVE_FORMATS = {
+    "webp": "WEBP",
+    "jpg": "JPEG",
+}
+
+# Поля с изображениями, для которых создаются производные
+IMAGE_FIELDS = (
+    ("shop_app.Product", "preview"),
+    ("shop_app.ProductImage", "src"),
+    ("shop_app.CatagoryImage", "src"),
+    ("shop_app.SubCategoryImage", "src"),
+    ("profile_app.Avatar", "src"),
+)
+
+_executor = None
+
+
+def derivative_name(name: str, size: str, extension: str) -> str:
+    """products/product_1/images/5.jpg -> products/product_1/images/5__card.webp"""
+    root = os.path.splitext(name)[0]
+    return "{}__{}.{}".format(root, size, extension)
+
+
+def srcset(field, widths: dict, extension: str = "jpg") -> str:
+    """
+    Строка srcset из производных изображения, widths - их ширины
+    по размерам (поле src_widths). Пока производные не созданы, строка
+    пустая. Имена вычисляются без обращения к хранилищу.
+    """
+    if not field or not widths:
+        return ""
+    # У небольших изображений несколько размеров имеют одну ширину
+    candidates = {}
+    for size in DERIVATIVE_SIZES:
+        if size in widths:
+            candidates.setdefault(widths[size], size)
+    return ", ".join(
+        "{} {}w".format(
+            field.storage.url(derivative_name(field.name, size, extension)), width
+        )
+        for width, size in sorted(candidates.items())
+    )
+
+
+def save_file(name: str, content) -> None:
+    """Сохраняет файл ровно под именем name, заменяя существующий."""
+    save_exact = getattr(default_storage, "save_exact", None)
+    if save_exact is not None:
+        save_exact(name, content)
+        return
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, content)
+
+
+def build_derivatives(name: str, force: bool = False) -> int:
+    """
+    Создает производные изображения name рядом с оригиналом и записывает
+    их ширины в строки, ссылающиеся на name (record_widths).
+    Изображение не увеличивается; существующие файлы пропускаются,
+    если не задан force. Возвращает количество созданных файлов.
+    """
+    names = {
+        (size, extension): derivative_name(name, size, extension)
+        for size in DERIVATIVE_SIZES
+        for extension in DERIVATIVE_FORMATS
+    }
+    if not force:
+        missing = {
+            key: value
+            for key, value in names.items()
+            if not default_storage.exists(value)
+        }
+    else:
+        missing = names
+
+    widths = {}
+    if missing:
+        with default_storage.open(name) as source:
+            original = ImageOps.exif_transpose(Image.open(source))
+            original = original.convert("RGB")
+        for (size, extension), target in missing.items():
+            width = DERIVATIVE_SIZES[size]
+            image = original.copy()
+            image.thumbnail((width, width), Image.LANCZOS)
+            content = io.BytesIO()
+            image.save(content, DERIVATIVE_FORMATS[extension], quality=82)
+            save_file(target, ContentFile(content.getvalue()))
+            widths[size] = image.width
+    for (size, extension), target in names.items():
+        if size not in widths:
+            # Ширина существующего файла читается из заголовка
+            with default_storage.open(target) as derivative:
+                widths[size] = Image.open(derivative).width
+    record_widths(name, widths)
+    return len(missing)
+
+
+def widths_field(model, field_name: str):
+    """Имя поля с ширинами производных или None, если его у модели нет."""
+    name = field_name + "_widths"
+    return name if any(f.name == name for f in model._meta.fields) else None
+
+
+def record_widths(name: str, widths: dict) -> None:
+    """Сохраняет ширины производных у строк, ссылающихся на name."""
+    updated = 0
+    for model_name, field_name in IMAGE_FIELDS:
+        model = apps.get_model(model_name)
+        target = widths_field(model, field_name)
+        if target is not None:
+            updated += model.objects.filter(**{field_name: name}).update(
+                **{target: widths}
+            )
+    if updated:
+        bump_catalog_version()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        )
+    return _executor
+
+
+def log_failure(future):
+    error = future.exception()
+    if error is not None:
+        log.error("Image derivatives failed: %s", error)
+
+
+def schedule_derivatives(name: str) -> None:
+    """
+    Ставит создание производных в пул процессов IMAGE_DERIVATIVE_WORKERS,
+    чтобы не занимать обработчик запроса (0 - создать сразу).
+    """
+    if not settings.IMAGE_DERIVATIVE_WORKERS:
+        build_derivatives(name, force=True)
+        return
+    get_executor().submit(build_derivatives, name, True).add_done_callback(log_failure)
@@ -0,0 +1,52 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import multiprocessing
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from shop_app.images import IMAGE_FIELDS, build_derivatives
+
+
+class Command(BaseCommand):
+    help = "Создает производные размеры для уже загруженных изображений"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--workers", type=int, default=settings.IMAGE_DERIVATIVE_WORKERS or 1
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Пересоздать существующие файлы"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        build = partial(build_derivatives, force=options["force"])
+        created = failed = 0
+        with ProcessPoolExecutor(
+            max_workers=options["workers"],
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        ) as executor:
+            for model_name, field_name in IMAGE_FIELDS:
+                queryset = (
+                    apps.get_model(model_name)
+                    .objects.exclude(**{field_name: ""})
+                    .exclude(**{field_name + "__isnull": True})
+                    .order_by("pk")
+                    .values_list(field_name, flat=True)
+                )
+                for offset in range(0, queryset.count(), batch_size):
+                    names = list(queryset[offset : offset + batch_size])
+                    for name, future in zip(
+                        names, [executor.submit(build, name) for name in names]
+                    ):
+                        try:
+                            created += future.result()
+                        except Exception as error:
+                            failed += 1
+                            self.stderr.write(f"{name}: {error}")
+        self.stdout.write(f"Created {created} files, {failed} images failed")
@@ -0,0 +1,55 @@
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError
+
+from shop_app.images import IMAGE_FIELDS
+from shop_app.models import MediaBlob
+from shop_app.storage import is_blob_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает ссылки на файлы хранилища по хешу "
+        "(старые файлы переносит команда relocate_media)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Удалить файлы, на которые не осталось ссылок",
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, "release"):
+            raise CommandError("Default storage is not ContentAddressedStorage")
+        refs = Counter()
+        for model_name, field_name in IMAGE_FIELDS:
+            names = apps.get_model(model_name).objects.values_list(
+                field_name, flat=True
+            )
+            refs.update(name for name in names.iterator() if is_blob_name(name))
+
+        known = set(MediaBlob.objects.values_list("name", flat=True))
+        MediaBlob.objects.bulk_create(
+            [
+                MediaBlob(name=name, size=default_storage.size(name))
+                for name in refs
+                if name not in known and default_storage.exists(name)
+            ]
+        )
+        blobs = list(MediaBlob.objects.all())
+        for blob in blobs:
+            blob.refs = refs.get(blob.name, 0)
+        MediaBlob.objects.bulk_update(blobs, ["refs"], batch_size=options["batch_size"])
+        unused = [blob.name for blob in blobs if not blob.refs]
+        if options["prune"]:
+            for name in unused:
+                default_storage.release(name)
+        self.stdout.write(
+            f"Counted {sum(refs.values())} references to {len(refs)} files, "
+            f"{len(unused)} unused files" + (" removed" if options["prune"] else "")
+        )
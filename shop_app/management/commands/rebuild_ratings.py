@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from shop_app.models import Product
+from shop_app.versioning import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сохраненные рейтинг и количество отзывов товаров"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_pk = 0
+        updated = 0
+        while True:
+            pks = list(
+                Product.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            with transaction.atomic():
+                updated += Product.objects.filter(pk__in=pks).rebuild_rating()
+            last_pk = pks[-1]
+        bump_catalog_version()
+        self.stdout.write(f"Updated {updated} products")
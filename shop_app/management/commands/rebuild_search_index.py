@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand, CommandError
+
+from shop_app.search import ensure_triggers, fts_enabled, rebuild_index
+from shop_app.versioning import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Перестраивает полнотекстовый индекс FTS5 по товарам "
+        "и восстанавливает его триггеры"
+    )
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            raise CommandError("Full-text index is available only on SQLite")
+        restored = ensure_triggers()
+        rebuild_index()
+        bump_catalog_version()
+        self.stdout.write(f"Search index rebuilt, {restored} triggers restored")
@@ -0,0 +1,117 @@
+import json
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+
+from shop_app.images import (
+    DERIVATIVE_FORMATS,
+    DERIVATIVE_SIZES,
+    IMAGE_FIELDS,
+    build_derivatives,
+    derivative_name,
+    widths_field,
+)
+from shop_app.storage import is_sharded_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит файлы со старыми путями (products/product_<pk>/...) "
+        "в текущую схему хранения и обновляет поля моделей"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--state",
+            default=os.path.join(settings.BASE_DIR, "relocate_media.json"),
+            help="Файл с позицией для продолжения после прерывания",
+        )
+        parser.add_argument("--restart", action="store_true", help="Начать с начала")
+        parser.add_argument(
+            "--delete-originals",
+            action="store_true",
+            help="Удалять перенесенные файлы, на которые больше нет ссылок",
+        )
+
+    def handle(self, *args, **options):
+        self.state_path = options["state"]
+        self.state = {}
+        if not options["restart"] and os.path.exists(self.state_path):
+            with open(self.state_path) as state_file:
+                self.state = json.load(state_file)
+
+        moved = 0
+        for model_name, field_name in IMAGE_FIELDS:
+            moved += self.relocate(
+                apps.get_model(model_name),
+                field_name,
+                options["batch_size"],
+                options["delete_originals"],
+            )
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        self.stdout.write(f"Relocated {moved} files")
+
+    def save_state(self, key, last_pk):
+        self.state[key] = last_pk
+        with open(self.state_path, "w") as state_file:
+            json.dump(self.state, state_file)
+
+    def relocate(self, model, field_name, batch_size, delete_originals):
+        key = "{}.{}".format(model._meta.label, field_name)
+        field = model._meta.get_field(field_name)
+        reset = {}
+        target = widths_field(model, field_name)
+        if target is not None:
+            reset[target] = {}
+        last_pk = self.state.get(key, 0)
+        moved = 0
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_pk)
+                .exclude(**{field_name: ""})
+                .exclude(**{field_name + "__isnull": True})
+                .order_by("pk")
+                .values_list("pk", field_name)[:batch_size]
+            )
+            if not rows:
+                return moved
+            originals = []
+            for pk, name in rows:
+                if is_sharded_name(name) or not default_storage.exists(name):
+                    continue
+                new_name = field.generate_filename(None, os.path.basename(name))
+                with default_storage.open(name) as content:
+                    new_name = default_storage.save(new_name, content)
+                model.objects.filter(pk=pk).update(**{field_name: new_name}, **reset)
+                originals.append(name)
+                moved += 1
+                try:
+                    build_derivatives(new_name)
+                except Exception as error:
+                    self.stderr.write(f"{new_name}: {error}")
+            if delete_originals and originals:
+                self.delete_unused(originals)
+            last_pk = rows[-1][0]
+            self.save_state(key, last_pk)
+
+    def delete_unused(self, names):
+        """Удаляет старые файлы и их производные, если на них не ссылаются."""
+        used = set()
+        for model_name, field_name in IMAGE_FIELDS:
+            used.update(
+                apps.get_model(model_name)
+                .objects.filter(**{field_name + "__in": names})
+                .values_list(field_name, flat=True)
+            )
+        for name in set(names) - used:
+            default_storage.delete(name)
+            for size in DERIVATIVE_SIZES:
+                for extension in DERIVATIVE_FORMATS:
+                    derivative = derivative_name(name, size, extension)
+                    if default_storage.exists(derivative):
+                        default_storage.delete(derivative)
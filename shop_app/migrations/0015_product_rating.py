@@ -0,0 +1,62 @@
+# Generated by Django 4.2 on 2026-10-17 01:41
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def rebuild_rating(apps, schema_editor):
+    Product = apps.get_model("shop_app", "Product")
+    Review = apps.get_model("shop_app", "Review")
+    reviews = Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+    Product.objects.update(
+        reviews_count=Coalesce(
+            Subquery(reviews.annotate(total=Count("pk")).values("total")), 0
+        ),
+        rating_sum=Coalesce(
+            Subquery(reviews.annotate(total=Sum("rate")).values("total")),
+            Value(0),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        rating=Coalesce(
+            Subquery(reviews.annotate(avg=Avg("rate")).values("avg")),
+            Value(0),
+            output_field=models.DecimalField(max_digits=3, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0014_alter_order_deliverytype"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating",
+            field=models.DecimalField(
+                db_index=True,
+                decimal_places=2,
+                default=0,
+                editable=False,
+                max_digits=3,
+                verbose_name="rating",
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=12
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="reviews_count",
+            field=models.PositiveIntegerField(
+                db_index=True, default=0, editable=False, verbose_name="reviews"
+            ),
+        ),
+        migrations.RunPython(rebuild_rating, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2 on 2026-10-17 02:10
+
+from django.db import migrations
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE shop_app_product_fts USING fts5(
+        title,
+        description,
+        fullDescription,
+        content='shop_app_product',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER shop_app_product_fts_insert AFTER INSERT ON shop_app_product
+    BEGIN
+        INSERT INTO shop_app_product_fts(rowid, title, description, fullDescription)
+        VALUES (new.id, new.title, new.description, new.fullDescription);
+    END
+    """,
+    """
+    CREATE TRIGGER shop_app_product_fts_delete AFTER DELETE ON shop_app_product
+    BEGIN
+        INSERT INTO shop_app_product_fts(
+            shop_app_product_fts, rowid, title, description, fullDescription
+        )
+        VALUES ('delete', old.id, old.title, old.description, old.fullDescription);
+    END
+    """,
+    """
+    CREATE TRIGGER shop_app_product_fts_update
+    AFTER UPDATE OF title, description, fullDescription ON shop_app_product
+    BEGIN
+        INSERT INTO shop_app_product_fts(
+            shop_app_product_fts, rowid, title, description, fullDescription
+        )
+        VALUES ('delete', old.id, old.title, old.description, old.fullDescription);
+        INSERT INTO shop_app_product_fts(rowid, title, description, fullDescription)
+        VALUES (new.id, new.title, new.description, new.fullDescription);
+    END
+    """,
+    "INSERT INTO shop_app_product_fts(shop_app_product_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS shop_app_product_fts_update",
+    "DROP TRIGGER IF EXISTS shop_app_product_fts_delete",
+    "DROP TRIGGER IF EXISTS shop_app_product_fts_insert",
+    "DROP TABLE IF EXISTS shop_app_product_fts",
+]
+
+
+def execute(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0015_product_rating"),
+    ]
+
+    operations = [
+        migrations.RunPython(execute(CREATE_SQL), execute(DROP_SQL)),
+    ]
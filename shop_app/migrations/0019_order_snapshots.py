@@ -0,0 +1,75 @@
+# Generated by Django 4.2 on 2026-10-17 03:40
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_snapshots(apps, schema_editor):
+    # Для уже оформленных заказов исходные цены неизвестны,
+    # берутся текущие название и цена товара
+    Order = apps.get_model("shop_app", "Order")
+    OrderProductCount = apps.get_model("shop_app", "OrderProductCount")
+    Product = apps.get_model("shop_app", "Product")
+    product = Product.objects.filter(pk=OuterRef("product_id"))
+    OrderProductCount.objects.update(
+        title=Subquery(product.values("title")[:1]),
+        unit_price=Subquery(product.values("price")[:1]),
+    )
+    lines = (
+        OrderProductCount.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(
+            total=Sum(
+                F("unit_price") * F("count_product"),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+    )
+    Order.objects.update(
+        total_cost=Coalesce(
+            Subquery(lines.values("total")),
+            Value(0),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop_app", "0018_stockhold"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="total_cost",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                max_digits=12,
+                verbose_name="total_cost",
+            ),
+        ),
+        migrations.AddField(
+            model_name="orderproductcount",
+            name="sale_applied",
+            field=models.BooleanField(default=False, verbose_name="sale"),
+        ),
+        migrations.AddField(
+            model_name="orderproductcount",
+            name="title",
+            field=models.CharField(blank=True, max_length=100, verbose_name="name"),
+        ),
+        migrations.AddField(
+            model_name="orderproductcount",
+            name="unit_price",
+            field=models.DecimalField(
+                decimal_places=2, default=0, max_digits=8, verbose_name="price"
+            ),
+        ),
+        migrations.RunPython(fill_snapshots, migrations.RunPython.noop),
+    ]
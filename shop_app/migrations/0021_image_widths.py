@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-17 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop_app", "0020_mediablob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="catagoryimage",
+            name="src_widths",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="productimage",
+            name="src_widths",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="subcategoryimage",
+            name="src_widths",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
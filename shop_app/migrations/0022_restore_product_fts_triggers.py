@@ -0,0 +1,56 @@
+# Generated by Django 4.2 on 2026-10-17 07:10
+
+from django.db import migrations
+
+# 0017 пересоздала таблицу shop_app_product (так SQLite добавляет столбец),
+# триггеры индекса при этом удалились
+CREATE_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_app_product_fts_insert
+    AFTER INSERT ON shop_app_product
+    BEGIN
+        INSERT INTO shop_app_product_fts(rowid, title, description, fullDescription)
+        VALUES (new.id, new.title, new.description, new.fullDescription);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_app_product_fts_delete
+    AFTER DELETE ON shop_app_product
+    BEGIN
+        INSERT INTO shop_app_product_fts(
+            shop_app_product_fts, rowid, title, description, fullDescription
+        )
+        VALUES ('delete', old.id, old.title, old.description, old.fullDescription);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS shop_app_product_fts_update
+    AFTER UPDATE OF title, description, fullDescription ON shop_app_product
+    BEGIN
+        INSERT INTO shop_app_product_fts(
+            shop_app_product_fts, rowid, title, description, fullDescription
+        )
+        VALUES ('delete', old.id, old.title, old.description, old.fullDescription);
+        INSERT INTO shop_app_product_fts(rowid, title, description, fullDescription)
+        VALUES (new.id, new.title, new.description, new.fullDescription);
+    END
+    """,
+    "INSERT INTO shop_app_product_fts(shop_app_product_fts) VALUES ('rebuild')",
+]
+
+
+def restore_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in CREATE_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0021_image_widths"),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,147 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    DecimalField,
+    F,
+    FloatField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce, Greatest
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from profile_app.models import Profile
+from .search import fts_enabled, fts_query, match_sql, rank_sql
+from .storage import sharded_upload_path
 
 
 def product_preview_dir_path(instanse: "Product", filename: str) -> str:
-    return "products/product_{pk}/preview/{filename}".format(
-        pk=instanse.pk,
-        filename=filename,
-    )
+    return sharded_upload_path("products/preview", filename)
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_price(self) -> "ProductQuerySet":
+        """
+        Аннотирует effective_price - цену с учетом действующей распродажи.
+        Если действующих распродаж несколько, берется минимальная цена.
+        """
+        sale_price = (
+            Sale.objects.active()
+            .filter(product=OuterRef("pk"))
+            .order_by("salePrice")
+            .values("salePrice")[:1]
+        )
+        return self.annotate(effective_price=Coalesce(Subquery(sale_price), F("price")))
+
+    def for_listing(self) -> "ProductQuerySet":
+        """
+        Проекция карточки товара для списков: цена с учетом распродажи
+        считается подзапросом, изображения и тэги подгружаются одним запросом
+        на всю выборку. Рейтинг и число отзывов хранятся в самом товаре.
+        """
+        return self.with_price().prefetch_related("images", "tags")
+
+    def for_detail(self, reviews_limit: int) -> "ProductQuerySet":
+        """
+        Проекция страницы товара: связанные данные подгружаются
+        фиксированным числом запросов, из отзывов - только первые
+        reviews_limit (в атрибуте first_reviews).
+        """
+        reviews = Review.objects.select_related("author").order_by("pk")
+        return self.with_price().prefetch_related(
+            "images",
+            "tags",
+            "specification",
+            models.Prefetch(
+                "review", queryset=reviews[:reviews_limit], to_attr="first_reviews"
+            ),
+        )
+
+    def search(self, text: str) -> "ProductQuerySet":
+        """
+        Поиск по названию и описаниям товара.
+        В SQLite используется индекс FTS5, результат получает ранг
+        search_rank (чем меньше, тем релевантнее).
+        """
+        query = fts_query(text)
+        if not fts_enabled() or not query:
+            return self.filter(
+                Q(title__icontains=text)
+                | Q(description__icontains=text)
+                | Q(fullDescription__icontains=text)
+            ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return self.filter(pk__in=RawSQL(match_sql(), [query])).annotate(
+            search_rank=RawSQL(rank_sql(), [query], output_field=FloatField())
+        )
+
+    def apply_review(self, product_id: int, rate, count: int = 1) -> int:
+        """
+        Инкрементально изменяет счетчики рейтинга товара.
+        Для удаления отзыва rate и count передаются со знаком минус.
+        """
+        rating_sum = F("rating_sum") + rate
+        reviews_count = F("reviews_count") + count
+        return self.filter(pk=product_id).update(
+            updated_at=timezone.now(),
+            rating_sum=rating_sum,
+            reviews_count=reviews_count,
+            rating=Case(
+                When(
+                    reviews_count__gt=-count,
+                    then=Cast(rating_sum, FloatField())
+                    / Cast(reviews_count, FloatField()),
+                ),
+                default=Value(0),
+                output_field=DecimalField(max_digits=3, decimal_places=2),
+            ),
+        )
+
+    def with_stock(self, exclude_owner: str = None) -> "ProductQuerySet":
+        """
+        Аннотирует reserved - количество в действующих резервах корзин
+        (кроме резервов exclude_owner) и stock_available - свободный остаток.
+        Сумма считается по индексу (product, expires_at, quantity).
+        """
+        holds = StockHold.objects.live().filter(product=OuterRef("pk"))
+        if exclude_owner is not None:
+            holds = holds.exclude(owner=exclude_owner)
+        reserved = holds.order_by().values("product").annotate(total=Sum("quantity"))
+        return self.annotate(
+            reserved=Coalesce(Subquery(reserved.values("total")), 0),
+            stock_available=F("count") - F("reserved"),
+        )
+
+    def rebuild_rating(self) -> int:
+        """Пересчитывает счетчики рейтинга по таблице отзывов."""
+        reviews = (
+            Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+        )
+        return self.update(
+            reviews_count=Coalesce(
+                Subquery(reviews.annotate(total=Count("pk")).values("total")), 0
+            ),
+            rating_sum=Coalesce(
+                Subquery(reviews.annotate(total=Sum("rate")).values("total")),
+                Value(0),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            rating=Coalesce(
+                Subquery(reviews.annotate(avg=Avg("rate")).values("avg")),
+                Value(0),
+                output_field=DecimalField(max_digits=3, decimal_places=2),
+            ),
+        )
 
 
 class Product(models.Model):
@@ -52,11 +184,49 @@ class Product(models.Model):
     tags = models.ManyToManyField("Tag", verbose_name=_("tag"))
     freeDelivery = models.BooleanField(default=False, verbose_name=_("delivery"))
     date = models.DateTimeField(auto_now_add=True, null=True, verbose_name=_("date"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated_at"))
     # available = models.BooleanField(default=False, verbose_name=_('available'))
     available = models.CharField(
         choices=AVAILABLE_CHOICES, max_length=30, null=True, default="true"
     )
     # sale = models.ForeignKey('Sale', null=True, on_delete=models.PROTECT, related_name='product')
+    rating_sum = models.DecimalField(
+        default=0, max_digits=12, decimal_places=2, editable=False
+    )
+    reviews_count = models.PositiveIntegerField(
+        default=0, db_index=True, editable=False, verbose_name=_("reviews")
+    )
+    rating = models.DecimalField(
+        default=0,
+        max_digits=3,
+        decimal_places=2,
+        db_index=True,
+        editable=False,
+        verbose_name=_("rating"),
+    )
+
+    objects = ProductQuerySet.as_manager()
+
+    # Меняются только запросами apply_review и rebuild_rating
+    COUNTER_FIELDS = ("rating_sum", "reviews_count", "rating")
+
+    def save(self, *args, **kwargs):
+        """
+        Сохранение загруженного товара не записывает счетчики рейтинга,
+        иначе устаревшие значения затрут отзывы, добавленные после загрузки.
+        """
+        if not self._state.adding and not kwargs.get("force_insert"):
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None:
+                update_fields = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key
+                ]
+            kwargs["update_fields"] = [
+                name for name in update_fields if name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self) -> str:
         name = _("product")
@@ -64,10 +234,7 @@ class Product(models.Model):
 
 
 def prod_image_dir_path(instanse: "ProductImage", filename: str) -> str:
-    return "products/product_{pk}/images/{filename}".format(
-        pk=instanse.product.pk,
-        filename=filename,
-    )
+    return sharded_upload_path("products/images", filename)
 
 
 class ProductImage(models.Model):
@@ -80,6 +247,9 @@ class ProductImage(models.Model):
     alt = models.CharField(
         max_length=250, null=False, blank=True, verbose_name=_("description")
     )
+    # Ширины созданных производных по размерам (см. shop_app.images),
+    # пока их нет, srcset не выводится
+    src_widths = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         verbose_name_plural = _("images")
@@ -98,16 +268,14 @@ class ProductCategory(models.Model):
     description = models.TextField(
         null=False, blank=True, verbose_name=_("description")
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated_at"))
 
     def __str__(self) -> str:
         return f" {self.title}"
 
 
 def category_image_dir_path(instanse: "ProductCategory", filename: str) -> str:
-    return "categories/category_{pk}/images/{filename}".format(
-        pk=instanse.category.pk,
-        filename=filename,
-    )
+    return sharded_upload_path("categories/images", filename)
 
 
 class CatagoryImage(models.Model):
@@ -124,6 +292,9 @@ class CatagoryImage(models.Model):
         null=False,
         blank=True,
     )
+    # Ширины созданных производных по размерам (см. shop_app.images),
+    # пока их нет, srcset не выводится
+    src_widths = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         verbose_name_plural = _("images")
@@ -145,10 +316,7 @@ class SubCategory(models.Model):
 
 
 def sub_category_image_dir_path(instanse: "SubCategory", filename: str) -> str:
-    return "subcategories/subcategory_{pk}/images/{filename}".format(
-        pk=instanse.pk,
-        filename=filename,
-    )
+    return sharded_upload_path("subcategories/images", filename)
 
 
 class SubCategoryImage(models.Model):
@@ -161,12 +329,30 @@ class SubCategoryImage(models.Model):
     alt = models.CharField(
         max_length=250, null=False, blank=True, verbose_name=_("description")
     )
+    # Ширины созданных производных по размерам (см. shop_app.images),
+    # пока их нет, srcset не выводится
+    src_widths = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         verbose_name_plural = _("images")
         verbose_name = _("image")
 
 
+class OrderQuerySet(models.QuerySet):
+    def for_history(self) -> "OrderQuerySet":
+        """
+        Проекция заказов для истории: суммы и цены берутся из заказа,
+        строки заказа с товарами, изображениями и тэгами подгружаются
+        фиксированным числом запросов на всю выборку.
+        """
+        lines = OrderProductCount.objects.select_related("product").prefetch_related(
+            "product__images", "product__tags"
+        )
+        return self.select_related("profile").prefetch_related(
+            models.Prefetch("orders", queryset=lines)
+        )
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ("unfinished", _("Unfinished")),
@@ -212,17 +398,41 @@ class Order(models.Model):
     deliveryType = models.CharField(
         choices=DELIVERY_CHOICES, max_length=30, null=True, default=None
     )
+    total_cost = models.DecimalField(
+        default=0,
+        max_digits=12,
+        decimal_places=2,
+        editable=False,
+        verbose_name=_("total_cost"),
+    )
+
+    objects = OrderQuerySet.as_manager()
 
     def __str__(self):
         return f"Order{self.pk}, {self.profile.fullName}"
 
 
 class OrderProductCount(models.Model):
+    """
+    Строка заказа.
+    Название и цена товара сохраняются на момент оформления и
+    не меняются вместе с каталогом.
+    """
+
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="order_products"
     )
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="orders")
     count_product = models.PositiveIntegerField(default=1)
+    title = models.CharField(max_length=100, blank=True, verbose_name=_("name"))
+    unit_price = models.DecimalField(
+        default=0, max_digits=8, decimal_places=2, verbose_name=_("price")
+    )
+    sale_applied = models.BooleanField(default=False, verbose_name=_("sale"))
+
+    @property
+    def total_price(self):
+        return self.unit_price * self.count_product
 
 
 class Review(models.Model):
@@ -256,6 +466,7 @@ class Tag(models.Model):
     """Модель тэга"""
 
     name = models.CharField(max_length=100, verbose_name=_("tag"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated_at"))
 
     class Meta:
         verbose_name = _("tag")
@@ -265,6 +476,20 @@ class Tag(models.Model):
         return self.name
 
 
+class SaleQuerySet(models.QuerySet):
+    def active(self, day=None) -> "SaleQuerySet":
+        """
+        Распродажи, действующие в указанный день (по умолчанию сегодня).
+        Дата попадает в SQL при построении выборки, поэтому такие выборки
+        (и with_price) нельзя сохранять в атрибутах классов.
+        """
+        day = day or timezone.localdate()
+        return self.filter(
+            Q(dateFrom__isnull=True) | Q(dateFrom__lte=day),
+            Q(dateTo__isnull=True) | Q(dateTo__gte=day),
+        )
+
+
 class Sale(models.Model):
     """Модель для товара учавствующего в распродаже"""
 
@@ -279,6 +504,8 @@ class Sale(models.Model):
         auto_now=False, null=True, blank=True, verbose_name=_("date_to")
     )
 
+    objects = SaleQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.salePrice}"
 
@@ -291,3 +518,103 @@ class Specification(models.Model):
     )
     name = models.CharField(max_length=150, null=True, blank=True)
     value = models.CharField(max_length=250)
+
+
+class StockHoldQuerySet(models.QuerySet):
+    def live(self, now=None) -> "StockHoldQuerySet":
+        return self.filter(expires_at__gt=now or timezone.now())
+
+    def expired(self, now=None) -> "StockHoldQuerySet":
+        return self.filter(expires_at__lte=now or timezone.now())
+
+    def reserve(self, owner: str, product_id: int, quantity: int, timeout) -> bool:
+        """
+        Резервирует за owner quantity штук товара на timeout секунд
+        (заменяя прежний резерв). Возвращает False, если свободного
+        остатка с учетом чужих резервов не хватает.
+        """
+        with transaction.atomic():
+            product = (
+                Product.objects.select_for_update()
+                .with_stock(exclude_owner=owner)
+                .filter(pk=product_id)
+                .first()
+            )
+            if product is None or quantity > product.stock_available:
+                return False
+            self.update_or_create(
+                owner=owner,
+                product_id=product_id,
+                defaults={
+                    "quantity": quantity,
+                    "expires_at": timezone.now() + timedelta(seconds=timeout),
+                },
+            )
+        return True
+
+    def release(self, owner: str, product_ids=None) -> int:
+        """Снимает резервы owner (все или по списку товаров)."""
+        holds = self.filter(owner=owner)
+        if product_ids is not None:
+            holds = holds.filter(product_id__in=product_ids)
+        return holds.delete()[0]
+
+    def transfer(self, owner: str, new_owner: str) -> None:
+        """Переносит резервы owner на new_owner, складывая количества."""
+        with transaction.atomic():
+            for hold in self.filter(owner=owner).select_for_update():
+                target = self.filter(owner=new_owner, product_id=hold.product_id)
+                updated = target.update(
+                    quantity=F("quantity") + hold.quantity,
+                    expires_at=Greatest("expires_at", Value(hold.expires_at)),
+                )
+                if updated:
+                    hold.delete()
+                else:
+                    self.filter(pk=hold.pk).update(owner=new_owner)
+
+
+class StockHold(models.Model):
+    """
+    Резерв товара в корзине.
+    Действует до expires_at; просроченные резервы не учитываются в остатке
+    и удаляются командой release_expired_holds.
+    """
+
+    owner = models.CharField(max_length=100)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="holds")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = StockHoldQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "product"], name="unique_stock_hold"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["product", "expires_at", "quantity"],
+                name="stock_hold_live_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner}: {self.product_id} x {self.quantity}"
+
+
+class MediaBlob(models.Model):
+    """
+    Файл хранилища ContentAddressedStorage.
+    refs - количество полей, ссылающихся на файл; файл удаляется,
+    когда ссылок не остается.
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refs = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} x {self.refs}"
@@ -0,0 +1,106 @@
+import logging
+import re
+
+from django.db import connection
+
+log = logging.getLogger(__name__)
+
+FTS_TABLE = "shop_app_product_fts"
+
+# Индекс обновляется триггерами. SQLite удаляет их, когда пересоздает
+# таблицу товаров (миграции AddField, AlterField), поэтому ensure_triggers
+# восстанавливает их после каждой миграции и в rebuild_search_index
+TRIGGERS = {
+    "shop_app_product_fts_insert": """
+    CREATE TRIGGER IF NOT EXISTS shop_app_product_fts_insert
+    AFTER INSERT ON shop_app_product
+    BEGIN
+        INSERT INTO shop_app_product_fts(rowid, title, description, fullDescription)
+        VALUES (new.id, new.title, new.description, new.fullDescription);
+    END
+    """,
+    "shop_app_product_fts_delete": """
+    CREATE TRIGGER IF NOT EXISTS shop_app_product_fts_delete
+    AFTER DELETE ON shop_app_product
+    BEGIN
+        INSERT INTO shop_app_product_fts(
+            shop_app_product_fts, rowid, title, description, fullDescription
+        )
+        VALUES ('delete', old.id, old.title, old.description, old.fullDescription);
+    END
+    """,
+    "shop_app_product_fts_update": """
+    CREATE TRIGGER IF NOT EXISTS shop_app_product_fts_update
+    AFTER UPDATE OF title, description, fullDescription ON shop_app_product
+    BEGIN
+        INSERT INTO shop_app_product_fts(
+            shop_app_product_fts, rowid, title, description, fullDescription
+        )
+        VALUES ('delete', old.id, old.title, old.description, old.fullDescription);
+        INSERT INTO shop_app_product_fts(rowid, title, description, fullDescription)
+        VALUES (new.id, new.title, new.description, new.fullDescription);
+    END
+    """,
+}
+
+# Веса столбцов title, description и fullDescription для bm25
+FTS_WEIGHTS = (10.0, 3.0, 1.0)
+
+
+def fts_enabled() -> bool:
+    """Полнотекстовый индекс создается миграцией только для SQLite."""
+    return connection.vendor == "sqlite"
+
+
+def fts_query(text: str) -> str:
+    """
+    Превращает пользовательский ввод в безопасный запрос FTS5:
+    каждое слово экранируется кавычками и ищется по префиксу.
+    """
+    words = re.findall(r"\w+", text)
+    return " ".join('"{}"*'.format(word) for word in words)
+
+
+def rank_sql() -> str:
+    weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+    return (
+        "SELECT bm25({table}, {weights}) FROM {table} "
+        "WHERE {table} MATCH %s AND {table}.rowid = shop_app_product.id"
+    ).format(table=FTS_TABLE, weights=weights)
+
+
+def match_sql() -> str:
+    return "SELECT rowid FROM {table} WHERE {table} MATCH %s".format(table=FTS_TABLE)
+
+
+def rebuild_index(using=None) -> None:
+    with (using or connection).cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO {table}({table}) VALUES ('rebuild')".format(table=FTS_TABLE)
+        )
+
+
+def ensure_triggers(using=None) -> int:
+    """
+    Создает недостающие триггеры индекса и, если какие-то пропали,
+    перестраивает индекс. Возвращает количество созданных триггеров.
+    """
+    using = using or connection
+    if using.vendor != "sqlite":
+        return 0
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, type FROM sqlite_master WHERE name = %s OR type = 'trigger'",
+            [FTS_TABLE],
+        )
+        existing = {name for name, kind in cursor.fetchall()}
+        if FTS_TABLE not in existing:
+            # Миграция с индексом еще не применена
+            return 0
+        missing = [name for name in TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(TRIGGERS[name])
+    if missing:
+        log.warning("Search index triggers were missing: %s", ", ".join(missing))
+        rebuild_index(using)
+    return len(missing)
@@ -0,0 +1,204 @@
+from functools import partial
+
+from django.apps import apps
+from django.db import connections, transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from profile_app.models import Profile
+from .models import (
+    Product,
+    ProductImage,
+    ProductCategory,
+    CatagoryImage,
+    Tag,
+    SubCategory,
+    SubCategoryImage,
+    Review,
+    Sale,
+    Specification,
+)
+from .images import IMAGE_FIELDS, schedule_derivatives, widths_field
+from .search import ensure_triggers
+from .versioning import bump_catalog_version
+
+CATALOG_MODELS = (
+    Product,
+    ProductImage,
+    ProductCategory,
+    CatagoryImage,
+    Tag,
+    SubCategory,
+    SubCategoryImage,
+    Review,
+    Sale,
+)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rate(sender, instance: Review, **kwargs):
+    """Запоминает прежние товар и оценку редактируемого отзыва."""
+    instance._previous = None
+    if instance.pk is not None:
+        instance._previous = (
+            Review.objects.filter(pk=instance.pk)
+            .values_list("product_id", "rate")
+            .first()
+        )
+
+
+def review_rate(instance: Review):
+    return Review._meta.get_field("rate").to_python(instance.rate)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance: Review, created: bool, **kwargs):
+    previous = getattr(instance, "_previous", None)
+    if previous is not None:
+        product_id, rate = previous
+        Product.objects.apply_review(product_id, -rate, -1)
+    Product.objects.apply_review(instance.product_id, review_rate(instance))
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance: Review, **kwargs):
+    Product.objects.apply_review(instance.product_id, -review_rate(instance), -1)
+
+
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(invalidate_catalog, sender=model)
+    post_delete.connect(invalidate_catalog, sender=model)
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def invalidate_catalog_on_tags(sender, instance, action: str, reverse: bool, **kwargs):
+    if reverse and action == "pre_clear":
+        Product.objects.filter(tags=instance).update(updated_at=timezone.now())
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        touch_products([instance.pk])
+    elif kwargs["pk_set"]:
+        touch_products(kwargs["pk_set"])
+    bump_catalog_version()
+
+
+def touch_products(product_ids):
+    """Обновляет updated_at товаров, чьи связанные данные изменились."""
+    Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+
+
+def touch_product(sender, instance, **kwargs):
+    touch_products([instance.product_id])
+
+
+for model in (ProductImage, Specification, Sale):
+    post_save.connect(touch_product, sender=model)
+    post_delete.connect(touch_product, sender=model)
+
+
+def touch_tagged_products(sender, instance: Tag, **kwargs):
+    """Название тэга выводится на странице товара."""
+    Product.objects.filter(tags=instance).update(updated_at=timezone.now())
+
+
+# При удалении тэга связи удаляются до post_delete
+post_save.connect(touch_tagged_products, sender=Tag)
+pre_delete.connect(touch_tagged_products, sender=Tag)
+
+
+@receiver(post_save, sender=Profile)
+def touch_reviewed_products(sender, instance: Profile, created: bool, **kwargs):
+    """Имя и email автора выводятся в отзывах на странице товара."""
+    if not created:
+        Product.objects.filter(review__author=instance).update(
+            updated_at=timezone.now()
+        )
+
+
+def touch_category(sender, instance, **kwargs):
+    categories = ProductCategory.objects.all()
+    if isinstance(instance, SubCategoryImage):
+        categories = categories.filter(subcategories=instance.subcategory_id)
+    else:
+        categories = categories.filter(pk=instance.category_id)
+    categories.update(updated_at=timezone.now())
+
+
+for model in (CatagoryImage, SubCategory, SubCategoryImage):
+    post_save.connect(touch_category, sender=model)
+    post_delete.connect(touch_category, sender=model)
+
+
+def remember_image(sender, instance, field_name, **kwargs):
+    """Запоминает имя загруженного изображения (отложенные поля пропускаются)."""
+    if field_name in instance.__dict__:
+        field = getattr(instance, field_name)
+        instance.__dict__.setdefault("_image_names", {})[field_name] = field.name
+
+
+def build_image_derivatives(sender, instance, field_name, **kwargs):
+    """Создает производные нового изображения и освобождает замененное."""
+    names = instance.__dict__.get("_image_names", {})
+    if field_name not in names:
+        return
+    field = getattr(instance, field_name)
+    if field.name == names[field_name]:
+        return
+    release_image(field.storage, names[field_name])
+    names[field_name] = field.name
+    # Производные прежнего файла к новому не относятся
+    target = widths_field(sender, field_name)
+    if target is not None and getattr(instance, target):
+        setattr(instance, target, {})
+        sender.objects.filter(pk=instance.pk).update(**{target: {}})
+    if field:
+        transaction.on_commit(partial(schedule_derivatives, field.name))
+
+
+def release_image(storage, name):
+    """Освобождает ссылку на замененный или удаленный файл (см. MediaBlob)."""
+    release = getattr(storage, "release", None)
+    if name and release is not None:
+        transaction.on_commit(partial(release, name))
+
+
+def delete_image(sender, instance, field_name, **kwargs):
+    if field_name in instance.__dict__:
+        field = getattr(instance, field_name)
+        release_image(field.storage, field.name)
+
+
+for model_name, field_name in IMAGE_FIELDS:
+    model = apps.get_model(model_name)
+    post_init.connect(
+        partial(remember_image, field_name=field_name), sender=model, weak=False
+    )
+    post_save.connect(
+        partial(build_image_derivatives, field_name=field_name),
+        sender=model,
+        weak=False,
+    )
+    post_delete.connect(
+        partial(delete_image, field_name=field_name), sender=model, weak=False
+    )
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, app_config, using, **kwargs):
+    """Восстанавливает триггеры индекса, удаленные при пересоздании таблицы."""
+    if app_config.label == "shop_app":
+        ensure_triggers(connections[using])
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+BLOB_NAME_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})\.\w+$")
+SHARDED_NAME_RE = re.compile(r"/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}\.\w+$")
+
+
+def blob_name(digest: str, extension: str) -> str:
+    """Имя файла по хешу содержимого: ab/cd/abcd....jpg"""
+    return "{}/{}/{}{}".format(digest[:2], digest[2:4], digest, extension)
+
+
+def is_blob_name(name: str) -> bool:
+    return bool(name and BLOB_NAME_RE.match(name))
+
+
+def sharded_upload_path(prefix: str, filename: str) -> str:
+    """
+    Путь загрузки, не зависящий от pk (при первом сохранении его еще нет):
+    prefix/ab/cd/<uuid>.jpg. Файлы распределяются по 65536 каталогам.
+    """
+    token = uuid.uuid4().hex
+    extension = os.path.splitext(filename)[1].lower()
+    return "{}/{}/{}/{}{}".format(prefix, token[:2], token[2:4], token, extension)
+
+
+def is_sharded_name(name: str) -> bool:
+    """Имя уже в новой схеме: по хешу содержимого или sharded_upload_path."""
+    return bool(name and (BLOB_NAME_RE.match(name) or SHARDED_NAME_RE.search(name)))
+
+
+def count_references(name: str) -> int:
+    """Количество полей изображений (IMAGE_FIELDS), ссылающихся на файл."""
+    from django.apps import apps
+
+    from .images import IMAGE_FIELDS
+
+    return sum(
+        apps.get_model(model_name).objects.filter(**{field_name: name}).count()
+        for model_name, field_name in IMAGE_FIELDS
+    )
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище медиафайлов без дубликатов.
+    Загруженный файл получает имя по SHA-256 содержимого в двух уровнях
+    каталогов, одинаковое содержимое записывается один раз, ссылки на файл
+    считаются в MediaBlob. Файлы со старыми именами (products/...,
+    uploads/...) читаются и отдаются как обычно.
+    """
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        name = blob_name(digest.hexdigest(), os.path.splitext(name)[1].lower())
+        self.acquire(name, content)
+        return name
+
+    def save_exact(self, name, content):
+        """Сохраняет файл под заданным именем (производные изображений)."""
+        if self.exists(name):
+            super().delete(name)
+        return super()._save(name, content)
+
+    def acquire(self, name, content=None):
+        """Добавляет ссылку на файл, записывая его, если файла еще нет."""
+        from .models import MediaBlob
+
+        while True:
+            try:
+                with transaction.atomic():
+                    blob = MediaBlob.objects.select_for_update().filter(name=name)
+                    if not blob.update(refs=F("refs") + 1):
+                        MediaBlob.objects.create(
+                            name=name, refs=1, size=content.size if content else 0
+                        )
+                    if content is not None and not self.exists(name):
+                        self.write(name, content)
+                return
+            except IntegrityError:
+                # Тот же файл одновременно загрузил другой запрос
+                continue
+
+    def write(self, name, content):
+        # Пишем во временный файл и атомарно переименовываем, чтобы
+        # одновременные загрузки одинакового файла не мешали друг другу
+        content.seek(0)
+        temporary = super()._save(name + ".tmp", content)
+        os.replace(self.path(temporary), self.path(name))
+
+    def release(self, name):
+        """
+        Убирает ссылку на файл; последний файл удаляется вместе
+        с производными изображениями. Старые имена не затрагиваются.
+        Ссылки, добавленные без записи файла (поле, которому присвоено имя
+        уже сохраненного файла), не считаются, поэтому перед удалением
+        проверяются поля моделей, и счетчик исправляется.
+        """
+        from .models import MediaBlob
+
+        if not is_blob_name(name):
+            return
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name)
+            if blob.filter(refs__gt=1).update(refs=F("refs") - 1):
+                return
+            refs = count_references(name)
+            if refs:
+                blob.update(refs=refs)
+                return
+            blob.delete()
+            directory, filename = os.path.split(name)
+            digest = os.path.splitext(filename)[0]
+            for other in self.listdir(directory)[1]:
+                if other.startswith(digest):
+                    super().delete(os.path.join(directory, other))
+
+    def delete(self, name):
+        # Файл может принадлежать нескольким полям
+        if is_blob_name(name):
+            self.release(name)
+        else:
+            super().delete(name)
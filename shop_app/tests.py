@@ -1,3 +1,72 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from profile_app.models import Profile
+from shop_app.models import Product, ProductCategory, Review
+from shop_app.search import TRIGGERS, ensure_triggers
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.category = ProductCategory.objects.create(title="phones")
+
+    def create_product(self, title):
+        return Product.objects.create(
+            title=title,
+            description="",
+            fullDescription="",
+            price=100,
+            count=1,
+            category=self.category,
+        )
+
+    def test_finds_new_product(self):
+        product = self.create_product("phone one")
+        self.assertEqual(list(Product.objects.search("phone")), [product])
+
+    def test_follows_title_change(self):
+        product = self.create_product("phone one")
+        product.title = "laptop one"
+        product.save()
+        self.assertEqual(list(Product.objects.search("phone")), [])
+        self.assertEqual(list(Product.objects.search("laptop")), [product])
+
+    def drop_triggers(self):
+        with connection.cursor() as cursor:
+            for name in TRIGGERS:
+                cursor.execute("DROP TRIGGER {}".format(name))
+
+    def test_rebuild_command_restores_triggers(self):
+        self.drop_triggers()
+        stale = self.create_product("phone one")
+        call_command("rebuild_search_index", stdout=StringIO())
+        product = self.create_product("phone two")
+        self.assertEqual(set(Product.objects.search("phone")), {stale, product})
+
+    def test_ensure_triggers_after_table_rebuild(self):
+        self.drop_triggers()
+        self.assertEqual(ensure_triggers(), len(TRIGGERS))
+        self.assertEqual(ensure_triggers(), 0)
+        product = self.create_product("phone one")
+        self.assertEqual(list(Product.objects.search("phone")), [product])
+
+
+class ProductRatingTest(TestCase):
+    def test_save_keeps_review_counters(self):
+        category = ProductCategory.objects.create(title="phones")
+        product = Product.objects.create(title="phone", price=100, category=category)
+        stale = Product.objects.get(pk=product.pk)
+        user = User.objects.create_user("author")
+        author = Profile.objects.create(user=user, fullName="A", email="a@shop.io")
+        Review.objects.create(product=product, author=author, text="ok", rate=5)
+
+        stale.title = "phone 2"
+        stale.save()
+
+        product.refresh_from_db()
+        self.assertEqual(product.title, "phone 2")
+        self.assertEqual((product.reviews_count, product.rating), (1, 5))
@@ -0,0 +1,41 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+CATALOG_VERSION_KEY = "catalog:version"
+
+
+def catalog_version() -> int:
+    """Текущая версия каталога; меняется при любом изменении товаров."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Начальное значение от времени, чтобы после вытеснения ключа
+        # версия не совпала с одной из уже использованных.
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version() -> None:
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+
+
+def catalog_cache_key(name: str, params) -> str:
+    """
+    Ключ кэша, зависящий от версии каталога и текущей даты
+    (цены распродаж меняются по датам без записи в базу).
+    """
+    data = json.dumps(params, sort_keys=True, cls=DjangoJSONEncoder)
+    return "catalog:{version}:{day}:{name}:{digest}".format(
+        version=catalog_version(),
+        day=timezone.localdate().isoformat(),
+        name=name,
+        digest=hashlib.md5(data.encode()).hexdigest(),
+    )
@@ -1,3 +1,150 @@
-from django.shortcuts import render
+import hashlib
+import mimetypes
+import os
+import re
 
-# Create your views here.
+from django.conf import settings
+from django.core.cache import cache
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+HASHED_NAME_RE = re.compile(r"(^|/)[0-9a-f]{2}/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})")
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MEDIA_CACHE_CONTROL = "public, max-age=3600"
+
+
+def file_etag(name: str, full_path: str, stat) -> str:
+    """
+    ETag по хешу содержимого. У файлов хранилища по хешу он берется из
+    имени, для остальных считается один раз на версию файла.
+    """
+    if HASHED_NAME_RE.search(name):
+        return '"{}"'.format(os.path.basename(name))
+    key = "media:etag:{}:{}:{}".format(
+        hashlib.md5(name.encode()).hexdigest(), stat.st_mtime_ns, stat.st_size
+    )
+    etag = cache.get(key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(full_path, "rb") as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        etag = '"{}"'.format(digest.hexdigest())
+        cache.set(key, etag, None)
+    return etag
+
+
+def parse_range(header: str, size: int):
+    """
+    Диапазон из заголовка Range: (начало, конец включительно) или None,
+    если заголовок не поддерживается (несколько диапазонов и т.п.).
+    Для недопустимого диапазона возвращается (size, size).
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return size, size
+    return start, end
+
+
+def read_range(full_path: str, start: int, length: int):
+    with open(full_path, "rb") as source:
+        source.seek(start)
+        while length > 0:
+            chunk = source.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Отдача медиафайлов в продакшене.
+    Условные запросы и Range обрабатываются здесь, а содержимое при
+    MEDIA_SERVE_OFFLOAD отдает веб-сервер (X-Accel-Redirect для nginx,
+    X-Sendfile для Apache и lighttpd). Файлы с хешем в имени кэшируются
+    клиентами навсегда.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404(path)
+    if not os.path.isfile(full_path):
+        raise Http404(path)
+
+    etag = file_etag(path, full_path, stat)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(stat.st_mtime),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": (
+            IMMUTABLE_CACHE_CONTROL
+            if HASHED_NAME_RE.search(path)
+            else MEDIA_CACHE_CONTROL
+        ),
+    }
+    if_none_match = request.headers.get("If-None-Match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or (
+        if_none_match.strip() == "*"
+    ):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+
+    offload = settings.MEDIA_SERVE_OFFLOAD
+    if offload:
+        # Range и передачу файла обрабатывает веб-сервер
+        response = HttpResponse(content_type=content_type)
+        if offload == "x-accel-redirect":
+            response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + path
+        else:
+            response["X-Sendfile"] = full_path
+    else:
+        size = stat.st_size
+        byte_range = None
+        if_range = request.headers.get("If-Range")
+        if "Range" in request.headers and (if_range is None or if_range == etag):
+            byte_range = parse_range(request.headers["Range"], size)
+        if byte_range is None:
+            response = FileResponse(open(full_path, "rb"), content_type=content_type)
+        elif byte_range[0] >= size:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = "bytes */{}".format(size)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                read_range(full_path, start, end - start + 1),
+                status=206,
+                content_type=content_type,
+            )
+            response["Content-Length"] = end - start + 1
+            response["Content-Range"] = "bytes {}-{}/{}".format(start, end, size)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response